@@ -1,24 +1,278 @@
 import os
-from datetime import datetime
+import io
+import json
+import hashlib
+import math
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from problem_detected_data_visualization import *
-from flask import Flask, render_template, redirect
+from ingestion_worker import INGESTION_WORKER_ENABLED, start_ingestion_worker, load_serving_state, get_serving_problem_detected_data
+from flask import Flask, render_template, redirect, request, abort, jsonify, g, Response
+
+# Profiling:
+# ?profile=1 returns a request's cProfile statistics instead of its page when enabled
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING", "False") == 'True'
+PROFILE_STATS_LINES = int(os.getenv("PROFILE_STATS_LINES", "50"))
+
+# HTTP Caching:
+# Seconds browsers and proxies may reuse a page before revalidating it with its ETag
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+# Seconds since the epoch when this process first saw each data version, which pages use
+# as their Last-Modified date, see get_data_version_modified()
+DATA_VERSION_MODIFIED = OrderedDict()
+DATA_VERSION_MODIFIED_LOCK = threading.Lock()
+MAX_DATA_VERSIONS = 256
+
+# Date Ranges:
+# The most days a page or status API request may cover. Longer ranges get a 400 response.
+MAX_RANGE_DAYS = int(os.getenv("MAX_RANGE_DAYS", "366"))
+
+# Warm-Up:
+# Load the current month's data and pages before a worker accepts requests, see warm_up()
+WARM_UP_AT_BOOT = os.getenv("WARM_UP_AT_BOOT", "False") == 'True'
+READINESS = {"ready" : False, "warm_up_seconds" : None, "error" : None}
 
 app = Flask(__name__)
+# Time spent rendering Jinja templates is reported as the "template" stage
+render_template = timed_stage("template")(render_template)
+
+# Precompute data in the background so requests don't have to read CSV files
+if INGESTION_WORKER_ENABLED:
+    start_ingestion_worker()
+
+@app.before_request
+def start_request_instrumentation():
+    """
+    Starts timing the stages of a request, and starts profiling it if profiling is 
+    enabled and the "profile" query parameter is 1.
+    """
+    g.request_start_time = time.perf_counter()
+    start_request_timings()
+
+    g.profiler = None
+    if REQUEST_PROFILING_ENABLED and request.args.get("profile") == "1":
+        # Imported here so that starting the app doesn't pay for profiling modules
+        import cProfile
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def finish_request_instrumentation(response):
+    """
+    Adds a Server-Timing header listing the time a request spent in each stage and in 
+    total. Profiled requests get their cProfile statistics as plain text instead.
+
+    Args:
+        response (flask.Response): The response to the request
+
+    Returns:
+        flask.Response: The response with a Server-Timing header
+    """
+    total_seconds = time.perf_counter() - g.request_start_time
+    stage_timings = finish_request_timings()
+    record_request_timing(request.endpoint or "unknown", total_seconds)
+
+    if g.profiler is not None:
+        import pstats
+        g.profiler.disable()
+        profile_stats = io.StringIO()
+        pstats.Stats(g.profiler, stream=profile_stats).sort_stats("cumulative").print_stats(PROFILE_STATS_LINES)
+        response = Response(profile_stats.getvalue(), mimetype="text/plain")
+
+    server_timings = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stage_timings.items()]
+    server_timings.append(f"total;dur={total_seconds * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(server_timings)
+    return response
+
+@app.after_request
+def add_cache_headers(response):
+    """
+    Adds the ETag, Last-Modified, and Cache-Control headers set by abort_if_not_modified()
+    to a successful response.
+
+    Args:
+        response (flask.Response): The response to the request
+
+    Returns:
+        flask.Response: The response with cache headers
+    """
+    cache_validators = g.get("cache_validators")
+    if cache_validators is None or g.get("profiler") is not None or response.status_code not in (200, 304):
+        return response
+
+    etag, last_modified = cache_validators
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = HTTP_CACHE_MAX_AGE
+    return response
+
+def abort_if_not_modified(problem_detected_df, as_of_date):
+    """
+    Validates the client's cached copy of the requested page. A page only changes when 
+    the data version of problem_detected_df changes or the date it displays changes, so 
+    its ETag is built from the data version, as_of_date, and the requested URL. Aborts 
+    with an empty 304 response if the If-None-Match header matches the ETag or, without 
+    If-None-Match, if If-Modified-Since is no older than both the time the data version
+    changed, from get_data_version_modified(), and the start of as_of_date. File 
+    modification times aren't used, since deleted files, recovered data sources, and 
+    the study state store change the data without any file getting newer. Otherwise, 
+    the response gets cache headers from add_cache_headers().
+
+    Args:
+        problem_detected_df (pandas.DataFrame): The problem_detected_df the page is 
+        built from
+
+        as_of_date (datetime.date): The newest date the page displays
+    """
+    data_version = problem_detected_df.attrs.get("data_version")
+    if data_version is None:
+        return
+
+    etag = hashlib.sha1(json.dumps([data_version, str(as_of_date), request.full_path]).encode()).hexdigest()[:16]
+    # A page also changes when the date it displays starts, even if no CSV files arrive
+    last_modified = datetime.combine(as_of_date, datetime.min.time()).astimezone(timezone.utc)
+    last_modified = max(last_modified, datetime.fromtimestamp(get_data_version_modified(data_version), timezone.utc))
+    g.cache_validators = (etag, last_modified)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
+    if not_modified:
+        abort(Response(status=304))
+
+def get_data_version_modified(data_version):
+    """
+    Returns when this process first saw a data version, in whole seconds since the 
+    epoch. Each new data version gets a later time than every data version before it, 
+    so an If-Modified-Since date from a page built from an older data version is 
+    always older than the current one. Times are kept for the MAX_DATA_VERSIONS most
+    recently seen data versions, and a forgotten data version gets a new time, which
+    only costs clients a full response.
+
+    Args:
+        data_version (str): The data version of a problem_detected_df
+
+    Returns:
+        int: The time the data version was first seen
+    """
+    with DATA_VERSION_MODIFIED_LOCK:
+        modified = DATA_VERSION_MODIFIED.get(data_version)
+        if modified is None:
+            # HTTP dates only have whole seconds, so rounding up keeps new versions apart
+            modified = max(math.ceil(time.time()), max(DATA_VERSION_MODIFIED.values(), default=0) + 1)
+            DATA_VERSION_MODIFIED[data_version] = modified
+            while len(DATA_VERSION_MODIFIED) > MAX_DATA_VERSIONS:
+                DATA_VERSION_MODIFIED.popitem(last=False)
+        DATA_VERSION_MODIFIED.move_to_end(data_version)
+        return modified
+
+@app.cli.command("ingest")
+def ingest():
+    """
+    Converts CSV files in the data directory, or the directories in DATA_SOURCES, into 
+    columnar snapshots that are read in place of the CSV files. Run with: flask --app app ingest
+    """
+    data_sources = get_data_sources().values() or [{"path_to_csv_directory" : DATA_DIRECTORY, "prefix" : ""}]
+    ingested_files = [file for data_source in data_sources 
+                      for file in ingest_csv_files_to_snapshots(data_source["path_to_csv_directory"], prefix=data_source["prefix"])]
+    print(f"Wrote {len(ingested_files)} snapshot(s) to {SNAPSHOT_DIRECTORY}")
+
+@app.cli.command("seed-state")
+def seed_state():
+    """
+    Records the file information of every CSV file in the data directory in the study 
+    state store in one pass. Each data source in DATA_SOURCES is recorded in its own
+    store. Run with: flask --app app seed-state
+    """
+    for data_source in get_data_sources().values():
+        recorded_files = seed_study_state(data_source["path_to_csv_directory"], data_source["path_to_study_state"], prefix=data_source["prefix"])
+        print(f"Recorded {len(recorded_files)} CSV file(s) in {data_source['path_to_study_state']}")
+    if not get_data_sources():
+        recorded_files = seed_study_state()
+        print(f"Recorded {len(recorded_files)} CSV file(s) in {STUDY_STATE_PATH}")
+
+def get_requested_date_range(num_days_in_past=DAYS_IN_MONTH):
+    """
+    Returns the date range requested with the "start" and "end" query parameters. Both 
+    must be formatted as YYYY-MM-DD. Aborts with a 400 response if either is formatted
+    improperly, if start comes after end, or if the range covers more than 
+    MAX_RANGE_DAYS days, since every day in the range is read.
+
+    Args:
+        num_days_in_past (int): The number of days the range covers when "start" is 
+        missing. Defaults to DAYS_IN_MONTH.
+
+    Returns:
+        (start_date, end_date): Returns a tuple of the oldest and newest dates in the 
+        requested range. end_date defaults to get_current_date().
+    """
+    try:
+        end_date = datetime.strptime(request.args["end"], "%Y-%m-%d").date() if "end" in request.args else get_current_date()
+        start_date = (datetime.strptime(request.args["start"], "%Y-%m-%d").date() if "start" in request.args 
+                      else end_date - timedelta(num_days_in_past - 1))
+    except ValueError:
+        abort(400, description="Dates must be formatted as YYYY-MM-DD")
+
+    if start_date > end_date:
+        abort(400, description="start must not come after end")
+    if (end_date - start_date).days + 1 > MAX_RANGE_DAYS:
+        abort(400, description=f"start and end must not be more than {MAX_RANGE_DAYS} days apart")
+
+    return (start_date, end_date)
+
+def warm_up():
+    """
+    Loads everything the first requests for the current month need: the status matrix 
+    persisted by the ingestion worker before a restart if there is one, or else the 
+    problem_detected_df and study summaries built from CSV files, along with the HTML 
+    tables of "/" and "/today" and the compiled templates. Marks this process as ready
+    once done. Failures are recorded in READINESS instead of raised.
+
+    Returns:
+        bool: True if warming up succeeded. False otherwise.
+    """
+    start_time = time.perf_counter()
+    try:
+        if INGESTION_WORKER_ENABLED:
+            # Memory-mapping a persisted status matrix is much faster than rebuilding it
+            load_serving_state()
+
+        current_date = get_current_date()
+        problem_detected_df, _ = get_serving_problem_detected_data(start_date=current_date - timedelta(DAYS_IN_MONTH - 1), end_date=current_date)
+        get_html_for_problem_detected_df(problem_detected_df, num_days_in_past=DAYS_IN_MONTH, current_date=current_date)
+        get_html_for_problem_detected_df(problem_detected_df, current_date=current_date)
+        for template in ("home.html", "single.html"):
+            app.jinja_env.get_template(template)
+    except Exception as exception:
+        print(f"Failed to warm up: {exception!r}")
+        READINESS["error"] = repr(exception)
+        return False
+
+    READINESS.update(ready=True, warm_up_seconds=time.perf_counter() - start_time, error=None)
+    return True
 
 @app.route("/", methods=["GET"])
 def display_past_month():
     """
-    Displays past_month_problem_detected_df for all studies
+    Displays past_month_problem_detected_df for all studies. The "start" and "end" query
+    parameters (YYYY-MM-DD) display any other range of dates instead.
 
     Returns:
         str: Returns a rendered template of home.html that displays 
         past_month_problem_detected_df as an HTML table
     """
-    df = build_df_from_csv_files()
-    problem_detected_df = get_problem_detected_df(df)
-    past_month_problem_detected_df = get_html_for_problem_detected_df(problem_detected_df, num_days_in_past=30)
+    start_date, end_date = get_requested_date_range()
+    problem_detected_df, _ = get_serving_problem_detected_data(start_date=start_date, end_date=end_date)
+    abort_if_not_modified(problem_detected_df, end_date)
+    past_month_problem_detected_df = get_html_for_problem_detected_df(problem_detected_df, num_days_in_past=(end_date - start_date).days + 1,
+                                                                      current_date=end_date)
 
-    return render_template("home.html", table=past_month_problem_detected_df, duration="in Past Month")
+    duration = f"from {start_date} to {end_date}" if request.args else "in Past Month"
+    return render_template("home.html", table=past_month_problem_detected_df, duration=duration)
 
 @app.route("/today", methods=["GET"])
 def display_today():
@@ -30,9 +284,10 @@ def display_today():
         str: Returns a rendered template of home.html that displays 
         todays_problem_detected_df as an HTML table
     """
-    df = build_df_from_csv_files()
-    problem_detected_df = get_problem_detected_df(df)
-    todays_problem_detected_df = get_html_for_problem_detected_df(problem_detected_df)
+    current_date = get_current_date()
+    problem_detected_df, _ = get_serving_problem_detected_data(start_date=current_date - timedelta(DAYS_IN_MONTH - 1), end_date=current_date)
+    abort_if_not_modified(problem_detected_df, current_date)
+    todays_problem_detected_df = get_html_for_problem_detected_df(problem_detected_df, current_date=current_date)
 
     if todays_problem_detected_df == "":
         return render_template("home.html", table=todays_problem_detected_df, duration="Today: NO DATA UPLOADED")
@@ -42,8 +297,12 @@ def display_today():
 def display_single(col):
     """
     Displays a given study's "Occurrence", "Last Successful Run Date",
-    "Last Successful Run Time", "Next Run Date", "Next Run Time", and its 
-    problem_detected_df over the past week and month.
+    "Last Successful Run Time", "Next Run Date", "Next Run Time", its recent errors,
+    and its problem_detected_df over the past week and month. The "start" and "end" 
+    query parameters (YYYY-MM-DD) select the range of dates that is read instead of the
+    past month, and the week and month end on "end". The study's error counts and 
+    streaks are only computed over the requested range, and a study without data in 
+    the range gets empty tables.
 
     Args:
        col (str): a studies Study ID 
@@ -56,33 +315,91 @@ def display_single(col):
     if col == '\xa0':
         return redirect("/", code=302)
         
+    start_date, end_date = get_requested_date_range()
+    problem_detected_df, study_summaries = get_serving_problem_detected_data(start_date=start_date, end_date=end_date)
+    abort_if_not_modified(problem_detected_df, end_date)
+    past_week_problem_detected_HTML = get_html_for_problem_detected_df(problem_detected_df, study_id=col, num_days_in_past=7, current_date=end_date)
+    past_month_problem_detected_HTML = get_html_for_problem_detected_df(problem_detected_df, study_id=col, num_days_in_past=DAYS_IN_MONTH, current_date=end_date)
+
+    # Summaries are precomputed for every study, so this is a dictionary lookup
+    summary_dict = study_summaries.get(col)
+    metadata_dict = summary_dict if summary_dict is not None and summary_dict["uploaded_on_date"] else None
 
-    df = build_df_from_csv_files()
-    problem_detected_df = get_problem_detected_df(df)
-
-    # Use either a date string "YYYY-MM-DD" or datetime.now().date() to build study_run_info_df
-    if os.getenv("RUNNING_WITH_DATE_STRING", 'False') == 'True':
-        DATE_STRING = os.getenv("DATE_STRING")
-        study_run_info_df = df[(df["Study ID"] == col) & (df["Date"] == datetime.strptime(DATE_STRING, "%Y-%m-%d").date())]
-    
-    else:    
-        study_run_info_df = df[(df["Study ID"] == col) & (df["Date"] == datetime.now().date())]
-    
-    
-    if study_run_info_df.empty:
-        past_week_problem_detected_HTML = get_html_for_problem_detected_df(problem_detected_df, study_id=col, num_days_in_past=7)
-        past_month_problem_detected_HTML = get_html_for_problem_detected_df(problem_detected_df, study_id=col, num_days_in_past=30)
-        return render_template("single.html", study_id=col, past_week_table=past_week_problem_detected_HTML, past_month_table=past_month_problem_detected_HTML)
-    
-    occurrence = study_run_info_df.iloc[-1]["Occurrence"]
-    last_successful_run_date = study_run_info_df.iloc[-1]["Last Successful Run Date"]
-    last_successful_run_time = study_run_info_df.iloc[-1]["Last Successful Run Time"]
-    next_run_date = study_run_info_df.iloc[-1]["Next Run Date"]
-    next_run_time = study_run_info_df.iloc[-1]["Next Run Time"]
-
-    past_week_problem_detected_HTML = get_html_for_problem_detected_df(problem_detected_df, study_id=col, num_days_in_past=7)
-    past_month_problem_detected_HTML = get_html_for_problem_detected_df(problem_detected_df, study_id=col, num_days_in_past=30)
-
-    return render_template("single.html", study_id=col, metadata_dict={"occurrence" : occurrence, "last_successful_run_date" : last_successful_run_date,
-                           "last_successful_run_time" : last_successful_run_time, "next_run_date" : next_run_date, "next_run_time" : next_run_time},
+    return render_template("single.html", study_id=col, metadata_dict=metadata_dict, summary_dict=summary_dict,
                            past_week_table=past_week_problem_detected_HTML, past_month_table=past_month_problem_detected_HTML)
+
+@app.route("/cacheStats", methods=["GET"])
+def display_cache_stats():
+    """
+    Displays the hit, miss, and eviction counts of the rendered HTML cache.
+
+    Returns:
+        flask.Response: Returns a JSON response containing the cache's statistics
+    """
+    return jsonify(get_html_cache_stats())
+
+@app.route("/metrics", methods=["GET"])
+def display_metrics():
+    """
+    Displays the cumulative time spent in each stage and endpoint and the statistics of 
+    the rendered HTML cache for this process.
+
+    Returns:
+        flask.Response: Returns the metrics in the Prometheus text format
+    """
+    return Response(get_metrics_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/ready", methods=["GET"])
+def display_readiness():
+    """
+    Reports whether this process is ready to serve requests. With WARM_UP_AT_BOOT, a
+    process is ready once warm_up() succeeds, and warming up is retried on each request
+    until it does. Health checks should only route requests to processes that respond
+    with 200.
+
+    Returns:
+        flask.Response: Returns READINESS as JSON with status 200 if ready and 503 otherwise
+    """
+    if not READINESS["ready"]:
+        warm_up()
+    return jsonify(READINESS), 200 if READINESS["ready"] else 503
+
+@app.route("/api/status", methods=["GET"])
+def get_status_json():
+    """
+    Returns the error statuses of studies between the "start" and "end" query parameters
+    (YYYY-MM-DD) as JSON built by get_problem_detected_json(). The "studies" query 
+    parameter takes comma separated Study IDs, "status" takes comma separated error 
+    statuses that a study must have at least once, and "page" and "page_size" select a
+    page of studies. Requests for unchanged data get an empty 304 response, see
+    abort_if_not_modified().
+
+    Returns:
+        flask.Response: Returns the statuses as JSON
+    """
+    start_date, end_date = get_requested_date_range()
+    study_ids = request.args["studies"].split(",") if request.args.get("studies") else None
+    statuses = request.args["status"].split(",") if request.args.get("status") else None
+    if statuses is not None and not set(statuses) <= STATUS_CLASSES:
+        abort(400, description=f"status must be one of {', '.join(sorted(STATUS_CLASSES))}")
+    try:
+        page = int(request.args.get("page", "1"))
+        page_size = int(request.args.get("page_size", str(API_PAGE_SIZE)))
+    except ValueError:
+        abort(400, description="page and page_size must be integers")
+    if page < 1 or not 1 <= page_size <= API_MAX_PAGE_SIZE:
+        abort(400, description=f"page must be at least 1 and page_size must be between 1 and {API_MAX_PAGE_SIZE}")
+
+    problem_detected_df, _ = get_serving_problem_detected_data(start_date=start_date, end_date=end_date)
+    # The response only depends on the data and the query, so it can be validated without building it
+    abort_if_not_modified(problem_detected_df, end_date)
+
+    return jsonify(get_problem_detected_json(problem_detected_df, start_date, end_date, study_ids=study_ids, statuses=statuses,
+                                             page=page, page_size=page_size))
+
+# gunicorn workers only accept requests once this module is imported, so no request 
+# waits for warming up
+if WARM_UP_AT_BOOT:
+    warm_up()
+else:
+    READINESS["ready"] = True
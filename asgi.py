@@ -0,0 +1,9 @@
+import os
+# Requests served by an ASGI server get the last good data instead of waiting for new CSV files
+os.environ.setdefault("STALE_WHILE_REVALIDATE", "True")
+
+from asgiref.wsgi import WsgiToAsgi
+from app import app
+
+# Run with: uvicorn asgi:asgi_app
+asgi_app = WsgiToAsgi(app)
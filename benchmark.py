@@ -0,0 +1,479 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import importlib
+import tracemalloc
+import socket
+import subprocess
+import http.client
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+# Benchmark Constants:
+BENCHMARK_DATA_DIRECTORY = os.getenv("BENCHMARK_DATA_DIRECTORY", "benchmark_data")
+BENCHMARK_RESULTS_PATH = "benchmark_results.json"
+BENCHMARK_END_DATE = datetime(2024, 7, 7).date()
+CSV_FILE_PREFIX = "NRG_N_TODAY_COMP_"
+CSV_FILE_COLUMNS = ["Study ID", "Last Run Date", "Last Run Time", "Last Successful Run Date", "Last Successful Run Time",
+                    "Next Run Date", "Next Run Time", "Occurrence", "Estimated Execution Time", "N: File Count",
+                    "N: Total File Size (MB)", "Number of Stale Data Files Detected", "Problem Detected"]
+# Chance that a study's data transfer fails or loses files on a given date
+FAILURE_RATE = 0.02
+FILE_LOSS_RATE = 0.01
+WEEKLY_STUDY_RATE = 0.2
+REGRESSION_THRESHOLD = 1.25
+# Port the app is started on to measure the time to first byte after a restart. 0 picks
+# a free port for each restart, so parallel runs and other servers don't collide.
+COLD_START_PORT = int(os.getenv("COLD_START_PORT", "0"))
+COLD_START_TIMEOUT_SECONDS = 300
+
+def generate_synthetic_data(path_to_csv_directory, num_studies=1000, num_days=365, end_date=BENCHMARK_END_DATE, seed=0):
+    """
+    Writes num_days CSV files ending on end_date to a directory, formatted like the CSV
+    files in the data directory. Each file holds a row for each of num_studies studies.
+    About WEEKLY_STUDY_RATE of the studies run weekly, FAILURE_RATE of the data transfers
+    fail, and FILE_LOSS_RATE of them lose files, so every error status appears.
+
+    Args:
+        path_to_csv_directory (str): path to the directory CSV files are written to
+
+        num_studies (int): The number of studies in each CSV file. Defaults to 1000.
+
+        num_days (int): The number of CSV files to write. Defaults to 365.
+
+        end_date (datetime.date): The date of the newest CSV file
+
+        seed (int): Seed of the random number generator, so data can be regenerated
+
+    Returns:
+        list: The names of the CSV files written
+    """
+    os.makedirs(path_to_csv_directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    study_ids = np.array([f"SYN-{i:05d}" for i in range(num_studies)], dtype=object)
+    is_weekly = rng.random(num_studies) < WEEKLY_STUDY_RATE
+    run_weekday = rng.integers(0, 7, num_studies)
+    run_times = np.array([f"{minutes // 60:02d}:{minutes % 60:02d}:00" for minutes in rng.integers(0, 48, num_studies) * 10], dtype=object)
+    occurrences = np.where(is_weekly, "Weekly", "Daily").astype(object)
+    execution_times = np.where(is_weekly, "00:05:00", "00:10:00").astype(object)
+
+    start_date = np.datetime64(end_date - timedelta(num_days - 1), "D")
+    last_run_dates = np.full(num_studies, start_date - 7)
+    last_successful_run_dates = last_run_dates.copy()
+    file_counts = rng.integers(10, 100, num_studies)
+    file_sizes = np.round(rng.uniform(10, 1000, num_studies), 2)
+
+    csv_files = []
+    for day in range(num_days):
+        date = start_date + day
+        # numpy.datetime64 days start on a Thursday, which is weekday 3
+        weekday = (date.astype(int) + 3) % 7
+        runs_today = ~is_weekly | (run_weekday == weekday)
+        succeeds = runs_today & (rng.random(num_studies) >= FAILURE_RATE)
+        loses_files = succeeds & (rng.random(num_studies) < FILE_LOSS_RATE)
+
+        file_counts = file_counts + succeeds * rng.integers(0, 3, num_studies) - loses_files * np.minimum(file_counts, 5)
+        file_sizes = np.round(file_sizes + succeeds * rng.uniform(0, 5, num_studies) - loses_files * np.minimum(file_sizes, 10), 2)
+        last_run_dates = np.where(runs_today, date, last_run_dates)
+        last_successful_run_dates = np.where(succeeds, date, last_successful_run_dates)
+        next_run_dates = np.where(is_weekly, date + (run_weekday - weekday - 1) % 7 + 1, date + 1)
+
+        file_df = pd.DataFrame({"Study ID" : study_ids, "Last Run Date" : np.datetime_as_string(last_run_dates),
+                                "Last Run Time" : run_times, "Last Successful Run Date" : np.datetime_as_string(last_successful_run_dates),
+                                "Last Successful Run Time" : run_times, "Next Run Date" : np.datetime_as_string(next_run_dates),
+                                "Next Run Time" : run_times, "Occurrence" : occurrences, "Estimated Execution Time" : execution_times,
+                                "N: File Count" : file_counts, "N: Total File Size (MB)" : file_sizes,
+                                "Number of Stale Data Files Detected" : 0, "Problem Detected" : ""}, columns=CSV_FILE_COLUMNS)
+
+        csv_file = f"{CSV_FILE_PREFIX}{date.astype(datetime):%Y%m%d}.csv"
+        file_df.to_csv(os.path.join(path_to_csv_directory, csv_file), index=False)
+        csv_files.append(csv_file)
+
+    return csv_files
+
+def time_function(function, repeat=5):
+    """
+    Calls a function repeat times and returns statistics of how long each call took.
+
+    Args:
+        function (callable): The function to time. Called without arguments.
+
+        repeat (int): The number of times to call the function. Defaults to 5.
+
+    Returns:
+        dict: A dictionary with the keys "min_ms", "median_ms", "mean_ms", and "repeat"
+    """
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start_time) * 1000)
+
+    return summarize_durations(durations)
+
+def summarize_durations(durations):
+    """
+    Returns statistics of durations measured in milliseconds.
+
+    Args:
+        durations (list of float): The durations in milliseconds
+
+    Returns:
+        dict: A dictionary with the keys "min_ms", "median_ms", "mean_ms", and "repeat"
+    """
+    return {"min_ms" : min(durations), "median_ms" : statistics.median(durations), "mean_ms" : statistics.mean(durations), 
+            "repeat" : len(durations)}
+
+def measure_cold_start(path_to_csv_directory, url="/", warm_up_at_boot=False, port=COLD_START_PORT, timeout_seconds=COLD_START_TIMEOUT_SECONDS):
+    """
+    Starts the app with gunicorn, the way it is deployed, and measures what a restart
+    costs. Polls "/ready" like a health check until it responds with 200, then times 
+    the first request to url until the first byte of its response arrives.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files the app serves
+
+        url (str): The URL of the first request. Defaults to "/".
+
+        warm_up_at_boot (bool): The value of WARM_UP_AT_BOOT the app is started with
+
+        port (int): The port the app is started on. 0 picks a free port with
+        get_free_port(). Defaults to COLD_START_PORT.
+
+        timeout_seconds (float): The number of seconds to wait for the app to be ready
+
+    Returns:
+        dict: A dictionary with the keys "ready_ms", the milliseconds from starting the
+        app until "/ready" responded with 200, and "first_byte_ms", the milliseconds 
+        from sending the first request to url until the first byte of its response
+    """
+    port = port if port != 0 else get_free_port()
+    environment = dict(os.environ, DATA_DIRECTORY=path_to_csv_directory, WARM_UP_AT_BOOT=str(warm_up_at_boot))
+    start_time = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", "1", 
+                               "--timeout", str(int(timeout_seconds)), "app:app"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_ms = None
+        while ready_ms is None:
+            if server.poll() is not None or time.perf_counter() - start_time > timeout_seconds:
+                raise RuntimeError(f"The app on port {port} did not become ready")
+            try:
+                status, _ = time_first_byte(port, "/ready")
+            except OSError:
+                # gunicorn hasn't bound its port yet
+                time.sleep(0.01)
+                continue
+            if status == 200:
+                ready_ms = (time.perf_counter() - start_time) * 1000
+
+        _, first_byte_ms = time_first_byte(port, url)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {"ready_ms" : ready_ms, "first_byte_ms" : first_byte_ms}
+
+def get_free_port():
+    """
+    Returns a port on 127.0.0.1 that no socket is bound to, chosen by the operating system.
+
+    Returns:
+        int: The port
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        return free_socket.getsockname()[1]
+
+def time_first_byte(port, url):
+    """
+    Sends a GET request to the app and measures how long it took to receive the status
+    line and headers of the response.
+
+    Args:
+        port (int): The port the app is listening on
+
+        url (str): The URL to request
+
+    Returns:
+        (int, float): Returns a tuple of the response's status code and the time to its
+        first byte in milliseconds
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=COLD_START_TIMEOUT_SECONDS)
+    try:
+        start_time = time.perf_counter()
+        connection.request("GET", url)
+        response = connection.getresponse()
+        first_byte_ms = (time.perf_counter() - start_time) * 1000
+        response.read()
+    finally:
+        connection.close()
+
+    return (response.status, first_byte_ms)
+
+def get_problem_detected_df_with_unstack(df):
+    """
+    Performs a groupby() operation on the Pandas DataFrame built from CSV files
+    in the data directory and accesses the values from the "Problem Detected" column.
+    It then unstacks the Pandas Series returned by this operation to create a Pandas 
+    DataFrame of error status strings, which is how problem_detected_dfs were built 
+    before get_problem_detected_df(). Kept to compare the memory use and slicing time 
+    of both representations.
+
+    Args:
+        df (pandas.DataFrame): The Pandas DataFrame built from CSV files in the data 
+        directory
+
+    Returns:
+        pandas.DataFrame: Returns a Pandas DataFrame where each element represents whether 
+        a problem occurred with a study's data transfer on a given date. 
+    """
+    return df.groupby(["Study ID", "Date"])["Problem Detected"].last().unstack()
+
+def compare_status_matrices(df, end_date, repeat=5):
+    """
+    Builds the problem_detected_df of df with get_problem_detected_df() and with
+    get_problem_detected_df_with_unstack(), measures the memory each one keeps, and 
+    times slicing the past 7, 30, and 365 days of each with 
+    get_problem_detected_df_between_dates().
+
+    Args:
+        df (pandas.DataFrame): The Pandas DataFrame built from CSV files
+
+        end_date (datetime.date): The newest date of the slices
+
+        repeat (int): The number of times each slice is timed. Defaults to 5.
+
+    Returns:
+        list: A dictionary for each representation and number of days with the keys 
+        "name", "min_ms", "median_ms", "mean_ms", "repeat", and "memory_bytes"
+    """
+    visualization = importlib.import_module("problem_detected_data_visualization")
+    builders = {"encoded" : visualization.get_problem_detected_df, "unstacked" : get_problem_detected_df_with_unstack}
+
+    results = []
+    for representation, builder in builders.items():
+        # Memory still allocated once the matrix is built, which counts the status strings
+        # a matrix shares only once rather than once per cell
+        tracemalloc.start()
+        problem_detected_df = builder(df)
+        memory_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        for num_days_in_past in (7, 30, 365):
+            timings = time_function(lambda: visualization.get_problem_detected_df_between_dates(problem_detected_df, current_date=end_date, 
+                                                                                                 num_days_in_past=num_days_in_past), repeat=repeat)
+            results.append({"name" : f"get_problem_detected_df_between_dates[{representation}, {num_days_in_past}]", **timings,
+                            "memory_bytes" : memory_bytes})
+
+    return results
+
+def render_problem_detected_table_with_styler(problem_detected_df):
+    """
+    Returns an HTML table for a problem_detected_df rendered with a pandas Styler, which 
+    is how tables were rendered before render_problem_detected_table(). Kept to compare 
+    the output size and render time of both renderers.
+
+    Args:
+        problem_detected_df (pandas.DataFrame): The Pandas DataFrame representing whether
+        a problem occurred with a study's data transfer on a given date.
+
+    Returns:
+        str: The HTML table associated with the problem_detected_df
+    """
+    visualization = importlib.import_module("problem_detected_data_visualization")
+    if (problem_detected_df.dtypes == np.uint8).all():
+        problem_detected_df = pd.DataFrame(visualization.decode_statuses(problem_detected_df.to_numpy()), index=problem_detected_df.index,
+                                           columns=problem_detected_df.columns).fillna(np.nan)
+
+    # Color td HTML elements according to their error status
+    styled_problem_detected_df = problem_detected_df.style.apply(lambda x : x.map(visualization.highlight_errors))
+    # Color the dates surrounding a missing date yellow
+    styled_problem_detected_df.apply_index(visualization.highlight_dates, axis=1)
+    return styled_problem_detected_df.to_html()
+
+def compare_table_renderers(problem_detected_df, repeat=5):
+    """
+    Times rendering a problem_detected_df with render_problem_detected_table() and with
+    render_problem_detected_table_with_styler(), and measures the size of their HTML.
+
+    Args:
+        problem_detected_df (pandas.DataFrame): The problem_detected_df to render
+
+        repeat (int): The number of times each renderer is run. Defaults to 5.
+
+    Returns:
+        list: A dictionary for each renderer with the keys "name", "min_ms", "median_ms",
+        "mean_ms", "repeat", and "output_bytes"
+    """
+    visualization = importlib.import_module("problem_detected_data_visualization")
+    renderers = {"render_problem_detected_table" : visualization.render_problem_detected_table,
+                 "render_problem_detected_table_with_styler" : render_problem_detected_table_with_styler}
+
+    results = []
+    for name, renderer in renderers.items():
+        output_bytes = len(renderer(problem_detected_df).encode())
+        results.append({"name" : f"{name}[all studies, 30]", **time_function(lambda: renderer(problem_detected_df), repeat=repeat),
+                        "output_bytes" : output_bytes})
+
+    return results
+
+def run_benchmarks(path_to_csv_directory, repeat=5, include_requests=True):
+    """
+    Times loading, classifying, slicing, and rendering the CSV files in a directory, 
+    compares both status matrices with compare_status_matrices() and both table 
+    renderers with compare_table_renderers(), and times requests to "/", "/today", and "/displaySingle/<col>" made with Flask's test client.
+    Requests are only timed when path_to_csv_directory is DATA_DIRECTORY, which is what
+    the Flask app serves, and are timed both with empty caches ("cold") and with the
+    data and HTML already cached ("warm").
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        repeat (int): The number of times each benchmark is run. Defaults to 5.
+
+        include_requests (bool): Whether to time requests to the Flask app
+
+    Returns:
+        list: A dictionary for each benchmark with the keys "name", "min_ms",
+        "median_ms", "mean_ms", and "repeat". Status matrix results also have 
+        "memory_bytes", and renderer results also have "output_bytes".
+    """
+    # Imported here so that main() can configure DATA_DIRECTORY before the app loads
+    visualization = importlib.import_module("problem_detected_data_visualization")
+
+    end_date = visualization.get_date_of_file(visualization.get_csv_files(path_to_csv_directory)[-1])
+    window_start_date = end_date - timedelta(visualization.DAYS_IN_MONTH - 1)
+    df = visualization.build_df_from_csv_files(path_to_csv_directory, start_date=datetime.min.date(), end_date=end_date)
+    problem_detected_df = visualization.get_problem_detected_df(df)
+    study_id = problem_detected_df.index[0]
+
+    benchmarks = {
+        "build_df_from_csv_files[month]" : lambda: visualization.build_df_from_csv_files(path_to_csv_directory, start_date=window_start_date, end_date=end_date),
+        "build_df_from_csv_files[all]" : lambda: visualization.build_df_from_csv_files(path_to_csv_directory, start_date=datetime.min.date(), end_date=end_date),
+        "get_problem_detected_df[all]" : lambda: visualization.get_problem_detected_df(df),
+    }
+    # problem_detected_df has no data version, so its HTML is rendered every time
+    benchmarks["get_html_for_problem_detected_df[all studies, 30]"] = lambda: visualization.get_html_for_problem_detected_df(problem_detected_df, num_days_in_past=30, current_date=end_date)
+    benchmarks["get_html_for_problem_detected_df[single study, 30]"] = lambda: visualization.get_html_for_problem_detected_df(problem_detected_df, study_id=study_id, num_days_in_past=30, current_date=end_date)
+
+    if include_requests and os.path.abspath(path_to_csv_directory) == os.path.abspath(visualization.DATA_DIRECTORY):
+        app = importlib.import_module("app").app
+        client = app.test_client()
+
+        def cold_request(url):
+            visualization.clear_process_caches()
+            return client.get(url)
+
+        for url in ("/", "/today", f"/displaySingle/{study_id}"):
+            benchmarks[f"GET {url} [cold]"] = lambda url=url: cold_request(url)
+            benchmarks[f"GET {url} [warm]"] = lambda url=url: client.get(url)
+
+    results = []
+    for name, benchmark in benchmarks.items():
+        results.append({"name" : name, **time_function(benchmark, repeat=repeat)})
+    results.extend(compare_status_matrices(df, end_date, repeat=repeat))
+    month_problem_detected_df = visualization.get_problem_detected_df_between_dates(problem_detected_df, current_date=end_date, num_days_in_past=30)
+    results.extend(compare_table_renderers(month_problem_detected_df, repeat=repeat))
+
+    return results
+
+def compare_benchmark_results(baseline_results, results, threshold=REGRESSION_THRESHOLD):
+    """
+    Returns the benchmarks whose median time grew by more than threshold times since
+    the baseline results were recorded.
+
+    Args:
+        baseline_results (list): Results returned by run_benchmarks() for an older version
+
+        results (list): Results returned by run_benchmarks() for the current version
+
+        threshold (float): The largest allowed ratio of the current median time to the
+        baseline median time. Defaults to REGRESSION_THRESHOLD.
+
+    Returns:
+        list: A dictionary for each regression with the keys "name", "baseline_median_ms",
+        "median_ms", and "ratio"
+    """
+    baseline_medians = {result["name"] : result["median_ms"] for result in baseline_results}
+    regressions = []
+    for result in results:
+        baseline_median = baseline_medians.get(result["name"])
+        if baseline_median is None or baseline_median == 0:
+            continue
+
+        ratio = result["median_ms"] / baseline_median
+        if ratio > threshold:
+            regressions.append({"name" : result["name"], "baseline_median_ms" : baseline_median, "median_ms" : result["median_ms"], "ratio" : ratio})
+
+    return regressions
+
+def main(argv=None):
+    """
+    Generates synthetic CSV files if needed, runs the benchmarks against them, and writes
+    the results as JSON. Exits with status 1 if --compare finds a regression. Run with:
+    python benchmark.py --studies 1000 --days 365
+    """
+    parser = argparse.ArgumentParser(description="Benchmark loading, classifying, and rendering CSV files.")
+    parser.add_argument("--studies", type=int, default=1000, help="number of studies in each synthetic CSV file")
+    parser.add_argument("--days", type=int, default=365, help="number of synthetic CSV files")
+    parser.add_argument("--data-directory", help="benchmark existing CSV files instead of synthetic ones")
+    parser.add_argument("--repeat", type=int, default=5, help="number of times each benchmark is run")
+    parser.add_argument("--output", default=BENCHMARK_RESULTS_PATH, help="path of the JSON results file")
+    parser.add_argument("--compare", help="path of a results file to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="allowed slowdown before a benchmark counts as a regression")
+    parser.add_argument("--cold-start", action="store_true", help="also time restarting the app with and without WARM_UP_AT_BOOT")
+    args = parser.parse_args(argv)
+
+    path_to_csv_directory = args.data_directory
+    if path_to_csv_directory is None:
+        path_to_csv_directory = os.path.join(BENCHMARK_DATA_DIRECTORY, f"{args.studies}_studies_{args.days}_days")
+        if not os.path.isdir(path_to_csv_directory) or len(os.listdir(path_to_csv_directory)) != args.days:
+            print(f"Generating {args.days} CSV files with {args.studies} studies in {path_to_csv_directory}")
+            generate_synthetic_data(path_to_csv_directory, num_studies=args.studies, num_days=args.days)
+
+    # Serve the benchmarked CSV files and treat their newest date as today
+    os.environ["DATA_DIRECTORY"] = path_to_csv_directory
+    os.environ["RUNNING_WITH_DATE_STRING"] = "True"
+    os.environ["DATE_STRING"] = str(max(datetime.strptime(file[file.rindex('_') + 1 : file.rindex('.')], "%Y%m%d").date()
+                                        for file in os.listdir(path_to_csv_directory) if file.endswith(".csv")))
+
+    results = run_benchmarks(path_to_csv_directory, repeat=args.repeat)
+    if args.cold_start:
+        for warm_up_at_boot in (False, True):
+            cold_starts = [measure_cold_start(path_to_csv_directory, warm_up_at_boot=warm_up_at_boot) for _ in range(args.repeat)]
+            results.append({"name" : f"restart until /ready [WARM_UP_AT_BOOT={warm_up_at_boot}]", 
+                            **summarize_durations([cold_start["ready_ms"] for cold_start in cold_starts])})
+            results.append({"name" : f"restart, first byte of GET / [WARM_UP_AT_BOOT={warm_up_at_boot}]", 
+                            **summarize_durations([cold_start["first_byte_ms"] for cold_start in cold_starts])})
+    report = {"created" : datetime.now().isoformat(timespec="seconds"), "python" : platform.python_version(),
+              "pandas" : pd.__version__, "numpy" : np.__version__, "data_directory" : path_to_csv_directory,
+              "num_studies" : args.studies if args.data_directory is None else None,
+              "num_days" : args.days if args.data_directory is None else None, "results" : results}
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for result in results:
+        sizes = "".join(f"   {size_key.split('_')[0]} {result[size_key]:>10} bytes" for size_key in ("memory_bytes", "output_bytes") if size_key in result)
+        print(f"{result['name']:<60} median {result['median_ms']:>10.2f} ms   min {result['min_ms']:>10.2f} ms{sizes}")
+    print(f"Wrote results to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            regressions = compare_benchmark_results(json.load(baseline_file)["results"], results, threshold=args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['name']}: {regression['baseline_median_ms']:.2f} ms -> {regression['median_ms']:.2f} ms "
+                  f"({regression['ratio']:.2f}x)")
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from problem_detected_data_visualization import *
+from shared_status_matrix import *
+
+# fcntl is only available on Unix. Without it, every process ingests data on its own.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Background Ingestion Worker:
+INGESTION_WORKER_ENABLED = os.getenv("INGESTION_WORKER", "False") == 'True'
+INGESTION_POLL_SECONDS = float(os.getenv("INGESTION_POLL_SECONDS", "10"))
+
+# The precomputed data served to requests. Replaced as a whole, never modified in place.
+SERVING_STATE = {}
+INGESTION_WORKER = {"thread" : None, "stop_event" : threading.Event(), "lock_file" : None}
+# Study summaries for requests the ingestion worker didn't precompute, keyed by data version and dates
+STUDY_SUMMARY_CACHE = OrderedDict()
+STUDY_SUMMARY_CACHE_LOCK = threading.Lock()
+register_process_cache(STUDY_SUMMARY_CACHE, STUDY_SUMMARY_CACHE_LOCK)
+
+# Stale-While-Revalidate Serving:
+# Requests get the last good data for their dates while new CSV files are read in the background
+STALE_WHILE_REVALIDATE = os.getenv("STALE_WHILE_REVALIDATE", "False") == 'True'
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "1"))
+# The last good data for each date range, and the refresh running for each date range
+LAST_GOOD_DATA = OrderedDict()
+REFRESHES = {}
+REFRESH_LOCK = threading.Lock()
+register_process_cache(LAST_GOOD_DATA, REFRESH_LOCK)
+REFRESH_WORKER = {"executor" : None}
+
+def start_ingestion_worker(path_to_csv_directory=DATA_DIRECTORY, poll_seconds=INGESTION_POLL_SECONDS,
+                           shared_matrix_directory=SHARED_MATRIX_DIRECTORY):
+    """
+    Starts a daemon thread that watches a data directory for new CSV files. When several
+    processes run a worker, such as gunicorn workers, only the process holding the lock
+    in shared_matrix_directory ingests new CSV files. It precomputes the status matrix 
+    and study summaries for the current month and writes them to shared_matrix_directory,
+    and the other processes memory-map them instead of reading CSV files themselves. 
+    Calling this more than once per process has no effect.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        poll_seconds (float): The number of seconds between checks for new CSV files
+
+        shared_matrix_directory (str): path to the directory that precomputed data is 
+        shared through
+    """
+    if INGESTION_WORKER["thread"] is not None and INGESTION_WORKER["thread"].is_alive():
+        return
+
+    INGESTION_WORKER["stop_event"].clear()
+    INGESTION_WORKER["thread"] = threading.Thread(target=run_ingestion_worker, args=(path_to_csv_directory, poll_seconds, shared_matrix_directory),
+                                                  name="ingestion-worker", daemon=True)
+    INGESTION_WORKER["thread"].start()
+
+def stop_ingestion_worker():
+    """
+    Stops the thread started by start_ingestion_worker() and releases its lock.
+    """
+    INGESTION_WORKER["stop_event"].set()
+    if INGESTION_WORKER["thread"] is not None:
+        INGESTION_WORKER["thread"].join()
+        INGESTION_WORKER["thread"] = None
+
+    if INGESTION_WORKER["lock_file"] is not None:
+        INGESTION_WORKER["lock_file"].close()
+        INGESTION_WORKER["lock_file"] = None
+
+def run_ingestion_worker(path_to_csv_directory, poll_seconds, shared_matrix_directory):
+    """
+    Refreshes SERVING_STATE every poll_seconds until stop_ingestion_worker() is called.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        poll_seconds (float): The number of seconds between checks for new CSV files
+
+        shared_matrix_directory (str): path to the directory that precomputed data is 
+        shared through
+    """
+    while True:
+        try:
+            refresh_serving_state(path_to_csv_directory, shared_matrix_directory)
+        except Exception as exception:
+            # Keep serving the last good state and try again on the next poll
+            print(f"Ingestion worker failed to refresh data: {exception!r}")
+
+        if INGESTION_WORKER["stop_event"].wait(poll_seconds):
+            return
+
+def refresh_serving_state(path_to_csv_directory=DATA_DIRECTORY, shared_matrix_directory=SHARED_MATRIX_DIRECTORY):
+    """
+    Updates SERVING_STATE once. The process holding the ingestion lock builds the
+    problem_detected_df for the current month, merging every registered data source, 
+    which only reads new CSV files, and
+    writes it to shared_matrix_directory when its data version changes. Other processes
+    memory-map the shared status matrix when its version changes.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        shared_matrix_directory (str): path to the directory that precomputed data is 
+        shared through
+    """
+    global SERVING_STATE
+
+    if not acquire_ingestion_lock(shared_matrix_directory):
+        load_serving_state(path_to_csv_directory, shared_matrix_directory)
+        return
+
+    data_sources = get_data_sources()
+    # Record older CSV files too, so the month is classified against every study's stored file information
+    if STUDY_STATE_STORE_ENABLED:
+        if data_sources:
+            for data_source in data_sources.values():
+                seed_study_state(data_source["path_to_csv_directory"], data_source["path_to_study_state"], prefix=data_source["prefix"])
+        else:
+            seed_study_state(path_to_csv_directory, STUDY_STATE_PATH)
+
+    current_date = get_current_date()
+    window = (current_date - timedelta(DAYS_IN_MONTH - 1), current_date)
+    df, problem_detected_df = get_problem_detected_data(path_to_csv_directory, start_date=window[0], end_date=window[1])
+
+    data_version = problem_detected_df.attrs.get("data_version")
+    if SERVING_STATE.get("window") != window or SERVING_STATE.get("data_version") != data_version:
+        study_summaries = get_study_summaries(df, problem_detected_df, window[1])
+        version = write_shared_status_matrix(problem_detected_df, study_summaries, window, shared_matrix_directory)
+        # Serve the mapped matrix too, so this process doesn't keep a second copy
+        SERVING_STATE = dict(load_shared_status_matrix(version, shared_matrix_directory), path_to_csv_directory=path_to_csv_directory)
+
+    # Convert new CSV files into snapshots so other date ranges load faster
+    if PARQUET_AVAILABLE:
+        for data_source in (data_sources.values() or [{"path_to_csv_directory" : path_to_csv_directory, "prefix" : ""}]):
+            ingest_csv_files_to_snapshots(data_source["path_to_csv_directory"], prefix=data_source["prefix"])
+
+def acquire_ingestion_lock(shared_matrix_directory=SHARED_MATRIX_DIRECTORY):
+    """
+    Tries to make this process the one that ingests new CSV files. The lock is held
+    until the process exits or stop_ingestion_worker() is called.
+
+    Args:
+        shared_matrix_directory (str): path to the directory that precomputed data is 
+        shared through
+
+    Returns:
+        bool: True if this process holds the ingestion lock. False otherwise.
+    """
+    if fcntl is None or INGESTION_WORKER["lock_file"] is not None:
+        return True
+
+    os.makedirs(shared_matrix_directory, exist_ok=True)
+    lock_file = open(os.path.join(shared_matrix_directory, "ingestion.lock"), "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    INGESTION_WORKER["lock_file"] = lock_file
+    return True
+
+def load_serving_state(path_to_csv_directory=DATA_DIRECTORY, shared_matrix_directory=SHARED_MATRIX_DIRECTORY):
+    """
+    Replaces SERVING_STATE with the shared status matrix in shared_matrix_directory if
+    its version changed since it was last loaded.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        shared_matrix_directory (str): path to the directory that precomputed data is 
+        shared through
+    """
+    global SERVING_STATE
+
+    version = get_current_shared_version(shared_matrix_directory)
+    if version is None or version == SERVING_STATE.get("version"):
+        return
+
+    SERVING_STATE = dict(load_shared_status_matrix(version, shared_matrix_directory), path_to_csv_directory=path_to_csv_directory)
+
+def get_problem_detected_data(path_to_csv_directory=DATA_DIRECTORY, start_date=None, end_date=None):
+    """
+    Returns the DataFrame and problem_detected_df for CSV files dated between start_date
+    and end_date. When data sources are registered, every source is merged by 
+    get_multi_source_problem_detected_data() and path_to_csv_directory is ignored.
+    Otherwise, the data directory is read by get_cached_problem_detected_data().
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date, optional): The oldest date
+
+        end_date (datetime.date, optional): The newest date
+
+    Returns:
+        (pandas.DataFrame, pandas.DataFrame): Returns a tuple of the DataFrame built
+        from the CSV files and its problem_detected_df. Callers must not modify either.
+    """
+    if get_data_sources():
+        return get_multi_source_problem_detected_data(start_date, end_date)
+    return get_cached_problem_detected_data(path_to_csv_directory, start_date=start_date, end_date=end_date)
+
+def get_data_fingerprint(path_to_csv_directory=DATA_DIRECTORY, start_date=None, end_date=None):
+    """
+    Returns a fingerprint of the CSV files read by get_problem_detected_data() for a date
+    range, which changes whenever one of them is added, removed, or rewritten in place,
+    or when the study state store changes what they are classified against.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date, optional): The oldest date
+
+        end_date (datetime.date, optional): The newest date
+
+    Returns:
+        tuple: The fingerprint returned by get_csv_files_fingerprint() and the version 
+        returned by get_study_state_version() for the data directory, or the name of 
+        each data source along with its fingerprint and version
+    """
+    data_sources = get_data_sources()
+    if not data_sources:
+        csv_files = get_csv_files_between_dates(path_to_csv_directory, start_date=start_date, end_date=end_date)
+        fingerprint = get_csv_files_fingerprint(path_to_csv_directory, csv_files)
+        return (fingerprint, get_study_state_version(fingerprint))
+
+    data_fingerprint = []
+    for name, data_source in sorted(data_sources.items()):
+        csv_files = get_csv_files_between_dates(data_source["path_to_csv_directory"], start_date=start_date, end_date=end_date,
+                                                prefix=data_source["prefix"])
+        fingerprint = get_csv_files_fingerprint(data_source["path_to_csv_directory"], csv_files)
+        data_fingerprint.append((name, fingerprint, get_study_state_version(fingerprint, data_source["path_to_study_state"])))
+    return tuple(data_fingerprint)
+
+def get_serving_problem_detected_data(path_to_csv_directory=DATA_DIRECTORY, start_date=None, end_date=None):
+    """
+    Returns the problem_detected_df for CSV files dated between start_date and end_date
+    along with the summary of each study as of end_date. Uses the data precomputed by the
+    ingestion worker when it covers the same dates, so requests don't pay for reading
+    CSV files. Falls back to get_revalidated_problem_detected_data() when 
+    STALE_WHILE_REVALIDATE is True, and to get_problem_detected_data_with_summaries() 
+    otherwise.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date, optional): The oldest date
+
+        end_date (datetime.date, optional): The newest date
+
+    Returns:
+        (pandas.DataFrame, dict): Returns a tuple of the problem_detected_df and the
+        summaries returned by get_study_summaries(). Statuses in the problem_detected_df
+        may be encoded with encode_statuses(). Callers must not modify either.
+    """
+    serving_state = SERVING_STATE
+    if serving_state.get("path_to_csv_directory") == path_to_csv_directory and serving_state.get("window") == (start_date, end_date):
+        return (serving_state["problem_detected_df"], serving_state["study_summaries"])
+
+    if STALE_WHILE_REVALIDATE:
+        return get_revalidated_problem_detected_data(path_to_csv_directory, start_date, end_date)
+    return get_problem_detected_data_with_summaries(path_to_csv_directory, start_date, end_date)
+
+def get_problem_detected_data_with_summaries(path_to_csv_directory=DATA_DIRECTORY, start_date=None, end_date=None):
+    """
+    Returns the problem_detected_df returned by get_problem_detected_data() along with 
+    the summary of each study as of end_date. Summaries are cached for each data 
+    version and date range.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date, optional): The oldest date
+
+        end_date (datetime.date, optional): The newest date
+
+    Returns:
+        (pandas.DataFrame, dict): Returns a tuple of the problem_detected_df and the
+        summaries returned by get_study_summaries()
+    """
+    df, problem_detected_df = get_problem_detected_data(path_to_csv_directory, start_date=start_date, end_date=end_date)
+    study_summary_key = (problem_detected_df.attrs.get("data_version"), start_date, end_date)
+    with STUDY_SUMMARY_CACHE_LOCK:
+        study_summaries = STUDY_SUMMARY_CACHE.get(study_summary_key)
+        if study_summaries is not None:
+            STUDY_SUMMARY_CACHE.move_to_end(study_summary_key)
+            return (problem_detected_df, study_summaries)
+
+    study_summaries = get_study_summaries(df, problem_detected_df, end_date)
+    with STUDY_SUMMARY_CACHE_LOCK:
+        STUDY_SUMMARY_CACHE[study_summary_key] = study_summaries
+        evict_least_recently_used_windows(STUDY_SUMMARY_CACHE, get_window=lambda key : key[1:])
+    return (problem_detected_df, study_summaries)
+
+def get_revalidated_problem_detected_data(path_to_csv_directory=DATA_DIRECTORY, start_date=None, end_date=None):
+    """
+    Returns the last good data returned by get_problem_detected_data_with_summaries() 
+    for a date range without waiting for CSV files that arrived since it was built. 
+    Instead, a refresh is started in the background and later requests get its data 
+    once it finishes. Only requests for a date range that was never built wait, and 
+    concurrent requests for the same date range share a single refresh.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date, optional): The oldest date
+
+        end_date (datetime.date, optional): The newest date
+
+    Returns:
+        (pandas.DataFrame, dict): Returns a tuple of the problem_detected_df and the
+        summaries returned by get_study_summaries()
+    """
+    key = (path_to_csv_directory, start_date, end_date)
+    data_fingerprint = get_data_fingerprint(*key)
+    with REFRESH_LOCK:
+        last_good_data = LAST_GOOD_DATA.get(key)
+        if last_good_data is not None:
+            LAST_GOOD_DATA.move_to_end(key)
+            if last_good_data["data_fingerprint"] == data_fingerprint:
+                return last_good_data["data"]
+
+        refresh = REFRESHES.get(key)
+        if refresh is None:
+            if REFRESH_WORKER["executor"] is None:
+                REFRESH_WORKER["executor"] = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="refresh")
+            refresh = REFRESH_WORKER["executor"].submit(refresh_problem_detected_data, *key)
+            REFRESHES[key] = refresh
+
+    if last_good_data is not None:
+        return last_good_data["data"]
+    return refresh.result()
+
+@timed_stage("refresh")
+def refresh_problem_detected_data(path_to_csv_directory, start_date, end_date):
+    """
+    Rebuilds the data for a date range and makes it the last good data returned by
+    get_revalidated_problem_detected_data(). The last good data is kept for the 
+    MAX_CACHED_WINDOWS most recently requested date ranges. Data merged while a data 
+    source was still loading or had failed is refreshed again on the next request.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date): The oldest date
+
+        end_date (datetime.date): The newest date
+
+    Returns:
+        (pandas.DataFrame, dict): Returns a tuple of the problem_detected_df and the
+        summaries returned by get_study_summaries()
+    """
+    key = (path_to_csv_directory, start_date, end_date)
+    try:
+        # Read before the CSV files, so files added during the refresh start another one
+        data_fingerprint = get_data_fingerprint(*key)
+        data = get_problem_detected_data_with_summaries(path_to_csv_directory, start_date, end_date)
+        if data[0].attrs.get("stale_sources") or data[0].attrs.get("failed_sources"):
+            data_fingerprint = None
+        with REFRESH_LOCK:
+            LAST_GOOD_DATA[key] = {"data_fingerprint" : data_fingerprint, "data" : data}
+            LAST_GOOD_DATA.move_to_end(key)
+            evict_least_recently_used_windows(LAST_GOOD_DATA, get_window=lambda key : key[1:])
+        return data
+    except Exception as exception:
+        # Keep serving the last good data and try again on the next request
+        print(f"Failed to refresh data from {start_date} to {end_date}: {exception!r}")
+        raise
+    finally:
+        with REFRESH_LOCK:
+            REFRESHES.pop(key, None)
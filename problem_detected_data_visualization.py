@@ -1,4 +1,19 @@
 import os
+import sys
+import threading
+import time
+import html
+import bisect
+import sqlite3
+import hashlib
+import importlib.util
+from contextlib import closing
+from functools import partial, wraps
+from urllib.parse import quote
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
@@ -10,63 +25,1404 @@ TEST_FILE_SIZE = 10000
 
 # Constants:
 PREV_DATA = {}
-DATA_DIRECTORY = "data"
+DATA_DIRECTORY = os.getenv("DATA_DIRECTORY", "data")
 COLUMNS = ["Study ID", "Date", "Occurrence", "Problem Detected", "Last Successful Run Date", 
            "Last Successful Run Time", "Next Run Date", "Next Run Time", "N: File Count", 
            "N: Total File Size (MB)"]
 EXCLUDE = {1}
 COLUMNS_FROM_CSV_FILE = [element for i, element in enumerate(COLUMNS) if i not in EXCLUDE]
-DAYS_IN_MONTH = 30
+DAYS_IN_MONTH = int(os.getenv("DAYS_IN_MONTH", "30"))
+STATUS_CLASSES = {'E', 'G', "NR"}
+# Statuses can be encoded as small integers. 0 represents a missing status.
+STATUS_NAMES = np.array([None, 'G', 'E', "NR"], dtype=object)
+STATUS_CODES = {status : code for code, status in enumerate(STATUS_NAMES) if status is not None}
+COLUMN_DTYPES = {"Study ID" : object, "Occurrence" : "category", "Problem Detected" : object, 
+                 "Last Successful Run Date" : object, "Last Successful Run Time" : object, 
+                 "Next Run Date" : object, "Next Run Time" : object, "N: File Count" : "float64", 
+                 "N: Total File Size (MB)" : "float64"}
+
+# Columnar Snapshots:
+SNAPSHOT_DIRECTORY = os.getenv("SNAPSHOT_DIRECTORY", "snapshots")
+SNAPSHOT_EXTENSION = ".parquet"
+# Parquet files are read and written with pyarrow, which is an optional dependency
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+# Rows read from a CSV file at a time when streaming. 0 reads whole CSV files instead.
+STREAMING_CHUNK_ROWS = int(os.getenv("STREAMING_CHUNK_ROWS", "0"))
+
+# Number of workers used to parse CSV files, and whether they are threads or processes
+LOADING_WORKERS = int(os.getenv("LOADING_WORKERS", "1"))
+LOADING_EXECUTOR = os.getenv("LOADING_EXECUTOR", "thread")
+
+# Date-Indexed File Index:
+FILE_INDEX = {}
+FILE_INDEX_LOCK = threading.Lock()
+
+# Dataset Cache:
+DATASET_CACHE = {}
+# Only guards adding cache entries. Each entry has its own lock, so a slow data directory
+# doesn't hold up the others.
+DATASET_CACHE_LOCK = threading.Lock()
+MAX_CACHED_WINDOWS = 8
+
+# Data Sources:
+# Feeds merged into one dashboard, formatted as "name=directory:prefix" and separated by
+# commas, where only CSV files whose names start with the optional prefix belong to the 
+# source. The prefix follows the last ":", see parse_data_source_location(). Without
+# DATA_SOURCES, DATA_DIRECTORY is the only source.
+DATA_SOURCES = {}
+DATA_SOURCES_SPEC = os.getenv("DATA_SOURCES", "")
+# Separates a source's name from each Study ID in a merged problem_detected_df
+SOURCE_SEPARATOR = ":"
+SOURCE_LOADING_WORKERS = int(os.getenv("SOURCE_LOADING_WORKERS", "4"))
+# Seconds to wait for a source before merging its last loaded data instead
+SOURCE_LOADING_TIMEOUT_SECONDS = float(os.getenv("SOURCE_LOADING_TIMEOUT_SECONDS", "5"))
+# The last data loaded from each source for each date range, the load running for each
+# source and date range, and merged data keyed by the data versions of its sources
+LAST_SOURCE_DATA = {}
+SOURCE_LOADS = {}
+SOURCE_LOADING_LOCK = threading.Lock()
+SOURCE_LOADER = {"executor" : None}
+MERGED_DATA_CACHE = OrderedDict()
+
+# Study State Store:
+# Each study's file information after every date, so a date range can be classified 
+# without replaying the dates before it
+STUDY_STATE_STORE_ENABLED = os.getenv("STUDY_STATE_STORE", "False") == 'True'
+STUDY_STATE_PATH = os.getenv("STUDY_STATE_PATH", os.path.join(SNAPSHOT_DIRECTORY, "study_state.sqlite3"))
+# Seconds to wait for another thread or process to finish writing to the store
+STUDY_STATE_TIMEOUT_SECONDS = 30
+
+# Rendered HTML Cache:
+HTML_CACHE = OrderedDict()
+HTML_CACHE_LOCK = threading.Lock()
+HTML_CACHE_MAX_BYTES = int(os.getenv("HTML_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+HTML_CACHE_TTL_SECONDS = float(os.getenv("HTML_CACHE_TTL_SECONDS", "3600"))
+HTML_CACHE_STATS = {"hits" : 0, "misses" : 0, "evictions" : 0, "bytes" : 0}
+
+# Process Caches:
+# Each in-process cache along with the lock guarding it and the function that empties it.
+# Emptied together by clear_process_caches(), see register_process_cache().
+PROCESS_CACHES = []
+
+# Status API:
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+API_MAX_PAGE_SIZE = 1000
+
+# Timing Instrumentation:
+# Cumulative number of calls and seconds spent in each stage and each Flask endpoint
+TIMING_STATS = {}
+REQUEST_STATS = {}
+TIMING_STATS_LOCK = threading.Lock()
+# Seconds spent in each stage during the request handled by the current thread
+REQUEST_TIMINGS = threading.local()
+
+def timed_stage(stage):
+    """
+    Returns a decorator that records how long each call of a function takes as time
+    spent in stage. See record_stage_timing().
+
+    Args:
+        stage (str): The name of the stage, such as "read_files"
+
+    Returns:
+        callable: The decorator
+    """
+    def decorator(function):
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_stage_timing(stage, time.perf_counter() - start_time)
+        return timed_function
+    return decorator
+
+def record_stage_timing(stage, seconds):
+    """
+    Adds seconds to the cumulative time spent in stage. If the current thread is handling
+    a request started with start_request_timings(), seconds is also added to the time the
+    request spent in stage.
+
+    Args:
+        stage (str): The name of the stage
+
+        seconds (float): The number of seconds spent in the stage
+    """
+    with TIMING_STATS_LOCK:
+        stage_stats = TIMING_STATS.setdefault(stage, {"count" : 0, "seconds" : 0.0})
+        stage_stats["count"] += 1
+        stage_stats["seconds"] += seconds
+
+    request_timings = getattr(REQUEST_TIMINGS, "stages", None)
+    if request_timings is not None:
+        request_timings[stage] = request_timings.get(stage, 0.0) + seconds
+
+def start_request_timings():
+    """
+    Starts recording the time spent in each stage by the current thread.
+    """
+    REQUEST_TIMINGS.stages = {}
+
+def finish_request_timings():
+    """
+    Stops recording the time spent in each stage by the current thread.
+
+    Returns:
+        dict: A dictionary mapping each stage to the seconds spent in it since 
+        start_request_timings() was called
+    """
+    request_timings = getattr(REQUEST_TIMINGS, "stages", None)
+    REQUEST_TIMINGS.stages = None
+    return request_timings if request_timings is not None else {}
+
+def record_request_timing(endpoint, seconds):
+    """
+    Adds seconds to the cumulative time spent handling requests to endpoint.
+
+    Args:
+        endpoint (str): The name of the Flask endpoint
+
+        seconds (float): The number of seconds spent handling the request
+    """
+    with TIMING_STATS_LOCK:
+        endpoint_stats = REQUEST_STATS.setdefault(endpoint, {"count" : 0, "seconds" : 0.0})
+        endpoint_stats["count"] += 1
+        endpoint_stats["seconds"] += seconds
+
+def get_metrics_text():
+    """
+    Returns the cumulative time spent in each stage and endpoint, and the statistics of
+    the rendered HTML cache, in the Prometheus text exposition format. Metrics are kept
+    per process.
+
+    Returns:
+        str: The metrics
+    """
+    with TIMING_STATS_LOCK:
+        timing_stats = {stage : dict(stats) for stage, stats in TIMING_STATS.items()}
+        request_stats = {endpoint : dict(stats) for endpoint, stats in REQUEST_STATS.items()}
+    html_cache_stats = get_html_cache_stats()
+
+    metrics = [
+        ("stage_seconds_total", "counter", "Seconds spent in each stage.", "stage", timing_stats, "seconds"),
+        ("stage_calls_total", "counter", "Number of times each stage ran.", "stage", timing_stats, "count"),
+        ("request_seconds_total", "counter", "Seconds spent handling requests to each endpoint.", "endpoint", request_stats, "seconds"),
+        ("requests_total", "counter", "Number of requests to each endpoint.", "endpoint", request_stats, "count"),
+    ]
+    lines = []
+    for name, metric_type, description, label, stats, field in metrics:
+        lines.extend([f"# HELP problem_detected_{name} {description}", f"# TYPE problem_detected_{name} {metric_type}"])
+        lines.extend(f'problem_detected_{name}{{{label}="{key}"}} {value[field]}' for key, value in sorted(stats.items()))
+
+    html_cache_metrics = [("html_cache_hits_total", "counter", "hits"), ("html_cache_misses_total", "counter", "misses"), 
+                          ("html_cache_evictions_total", "counter", "evictions"), ("html_cache_entries", "gauge", "entries"),
+                          ("html_cache_bytes", "gauge", "bytes")]
+    for name, metric_type, field in html_cache_metrics:
+        lines.extend([f"# TYPE problem_detected_{name} {metric_type}", f"problem_detected_{name} {html_cache_stats[field]}"])
+
+    return "\n".join(lines) + "\n"
 
 # Build DataFrame from Data in CSV Files:
-def build_df_from_csv_files(path_to_csv_directory=DATA_DIRECTORY, testing=False):
+def build_df_from_csv_files(path_to_csv_directory=DATA_DIRECTORY, testing=False, num_workers=LOADING_WORKERS,
+                            start_date=None, end_date=None, prefix=""):
+    """
+    Constructs a Pandas DataFrame from CSV files in a data directory. The columns of this 
+    DataFrame are: "Study ID", "Date", "Occurrence", "Problem Detected", "Last Successful
+    Run Date", "Last Successful Run Time", "Next Run Date", "Next Run Time", 
+    "N: File Count", and "N: Total File Size (MB)". Only CSV files dated between 
+    start_date and end_date whose names start with prefix are read. CSV files are 
+    streamed STREAMING_CHUNK_ROWS rows at a time when STREAMING_CHUNK_ROWS is positive.
+    To read several data directories or feeds, see get_multi_source_problem_detected_data().
+    
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+        testing (bool): True if testing, False otherwise.
+        num_workers (int): The number of workers that parse CSV files concurrently.
+        Defaults to LOADING_WORKERS.
+        start_date (datetime.date, optional): The oldest date to read. Defaults to 
+        DAYS_IN_MONTH - 1 days before end_date.
+        end_date (datetime.date, optional): The newest date to read. Defaults to the date 
+        of the newest CSV file.
+        prefix (str): The prefix of the names of the CSV files to read. Defaults to "", 
+        which reads every CSV file.
+
+    Returns:
+        pandas.DataFrame: The Pandas DataFrame built by concatenating CSV files in the 
+        data directory
+    """
+    # Each build gets its own file information, so concurrent builds can't interfere.
+    # Tests read the file information of the test data from PREV_DATA.
+    if testing:
+        add_test_data_to_prev_data()
+        prev_data = PREV_DATA
+    else:
+        prev_data = {}
+
+    csv_files = get_csv_files_between_dates(path_to_csv_directory, start_date=start_date, end_date=end_date, prefix=prefix)
+    csv_file_paths = [os.path.join(path_to_csv_directory, file) for file in csv_files]
+    if STREAMING_CHUNK_ROWS > 0:
+        return build_df_from_csv_file_chunks(csv_file_paths, chunk_rows=STREAMING_CHUNK_ROWS, prev_data=prev_data)
+
+    file_dfs = read_csv_files(csv_file_paths, num_workers=num_workers)
+
+    return build_df_from_file_dfs(file_dfs, prev_data=prev_data)
+
+def get_csv_files(path_to_csv_directory=DATA_DIRECTORY):
+    """
+    Returns the names of the CSV files in a data directory sorted by name. Data files
+    have the naming convention NRG_N_TODAY_COMP_YYYYMMDD.csv, so sorting by name also
+    sorts them by date.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+    Returns:
+        list of str: The sorted names of the CSV files in the data directory
+    """
+    csv_files = os.listdir(path_to_csv_directory)
+    # Order of csv_files could differ based on OS
+    csv_files.sort()
+
+    return csv_files
+
+def get_file_index(path_to_csv_directory=DATA_DIRECTORY, prefix=""):
+    """
+    Returns an index mapping dates to the CSV files in a data directory. The index is
+    built once per data directory and prefix by parsing file names with get_date_of_file()
+    and is updated when the data directory's modification time changes, which only parses
+    the names of files that weren't indexed before. Files that don't follow the naming 
+    convention <prefix>YYYYMMDD.csv, such as NRG_N_TODAY_COMP_YYYYMMDD.csv, are ignored.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        prefix (str): The prefix of the names of the indexed CSV files. Defaults to "",
+        which indexes every CSV file.
+
+    Returns:
+        dict: A dictionary with the keys "dates", a sorted list of the dates that have a 
+        CSV file, and "files", a dictionary mapping each of these dates to its CSV file.
+        Callers must not modify the index.
+    """
+    index_key = (path_to_csv_directory, prefix)
+    directory_mtime = os.stat(path_to_csv_directory).st_mtime_ns
+    file_index = FILE_INDEX.get(index_key)
+    if file_index is not None and file_index["directory_mtime"] == directory_mtime:
+        return file_index
+
+    with FILE_INDEX_LOCK:
+        file_index = FILE_INDEX.get(index_key)
+        if file_index is not None and file_index["directory_mtime"] == directory_mtime:
+            return file_index
+
+        file_dates = dict(file_index["file_dates"]) if file_index is not None else {}
+        csv_files = [file for file in get_csv_files(path_to_csv_directory) if file.startswith(prefix)]
+        for file in csv_files:
+            if file not in file_dates:
+                try:
+                    file_dates[file] = get_date_of_file(file)
+                except ValueError:
+                    file_dates[file] = None
+
+        # Forget files that were removed from the data directory
+        file_dates = {file : file_dates[file] for file in csv_files}
+        # csv_files is sorted, so a later file wins if two files share a date
+        files = {date : file for file, date in file_dates.items() if date is not None}
+        
+        file_index = {"directory_mtime" : directory_mtime, "file_dates" : file_dates,
+                      "dates" : sorted(files), "files" : files}
+        FILE_INDEX[index_key] = file_index
+
+    return file_index
+
+@timed_stage("list_files")
+def get_csv_files_between_dates(path_to_csv_directory=DATA_DIRECTORY, start_date=None, end_date=None, prefix=""):
+    """
+    Returns the names of the CSV files in a data directory dated between start_date and
+    end_date, inclusive. 
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date, optional): The oldest date. Defaults to DAYS_IN_MONTH - 1 
+        days before end_date.
+
+        end_date (datetime.date, optional): The newest date. Defaults to the date of the 
+        newest CSV file.
+
+        prefix (str): The prefix of the names of the CSV files. Defaults to "", which 
+        includes every CSV file.
+
+    Returns:
+        list of str: The names of the CSV files dated between start_date and end_date 
+        ordered from oldest to newest
+    """
+    file_index = get_file_index(path_to_csv_directory, prefix=prefix)
+    dates = file_index["dates"]
+    if not dates:
+        return []
+    
+    end_date = end_date if end_date is not None else dates[-1]
+    start_date = start_date if start_date is not None else end_date - timedelta(DAYS_IN_MONTH - 1)
+    start, end = bisect.bisect_left(dates, start_date), bisect.bisect_right(dates, end_date)
+
+    return [file_index["files"][date] for date in dates[start:end]]
+
+def read_csv_file(file_path, path_to_snapshot_directory=SNAPSHOT_DIRECTORY):
+    """
+    Reads a single CSV file into a Pandas DataFrame containing the columns in
+    COLUMNS_FROM_CSV_FILE and a "Date" column holding the date of the file. The
+    "Problem Detected" column is left as it appears in the CSV file. If the CSV file 
+    has an up-to-date columnar snapshot, the snapshot is read instead.
+
+    Args:
+        file_path (str): path to a CSV file
+
+        path_to_snapshot_directory (str): path to directory containing columnar 
+        snapshots of CSV files. Defaults to SNAPSHOT_DIRECTORY.
+
+    Returns:
+        pandas.DataFrame: The unformatted data associated with a single CSV file
+    """
+    snapshot_path = get_snapshot_path(file_path, path_to_snapshot_directory)
+    if is_snapshot_current(file_path, snapshot_path):
+        return read_snapshot_file(snapshot_path)
+
+    date = get_date_of_file(file_path)
+    current_file_df = pd.read_csv(file_path, usecols=COLUMNS_FROM_CSV_FILE, dtype=COLUMN_DTYPES)
+    current_file_df = current_file_df.loc[:,COLUMNS_FROM_CSV_FILE]
+
+    # Insert date into current file's DataFrame
+    current_file_df.insert(loc=1, column="Date", value=date)
+
+    return current_file_df
+
+@timed_stage("read_files")
+def read_csv_files(file_paths, path_to_snapshot_directory=SNAPSHOT_DIRECTORY, num_workers=LOADING_WORKERS):
+    """
+    Reads several CSV files into Pandas DataFrames like read_csv_file(). The up-to-date
+    columnar snapshots of these CSV files are read together in a single pass, and the 
+    remaining CSV files are parsed concurrently by num_workers workers.
+
+    Args:
+        file_paths (list of str): paths to CSV files
+
+        path_to_snapshot_directory (str): path to directory containing columnar 
+        snapshots of CSV files. Defaults to SNAPSHOT_DIRECTORY.
+
+        num_workers (int): The number of workers that parse CSV files concurrently.
+        Defaults to LOADING_WORKERS.
+
+    Returns:
+        list of pandas.DataFrame: The unformatted data associated with each CSV file in
+        the order of file_paths
+    """
+    snapshot_paths = [get_snapshot_path(file_path, path_to_snapshot_directory) for file_path in file_paths]
+    is_current = [is_snapshot_current(file_path, snapshot_path) for file_path, snapshot_path in zip(file_paths, snapshot_paths)]
+
+    csv_file_paths = [file_path for file_path, current in zip(file_paths, is_current) if not current]
+    csv_file_dfs = iter(map_with_workers(partial(read_csv_file, path_to_snapshot_directory=None), csv_file_paths, num_workers))
+    current_snapshot_paths = [snapshot_path for snapshot_path, current in zip(snapshot_paths, is_current) if current]
+    snapshot_dfs = iter(read_snapshot_files(current_snapshot_paths))
+    
+    return [next(snapshot_dfs) if current else next(csv_file_dfs) for current in is_current]
+
+def map_with_workers(function, items, num_workers=LOADING_WORKERS, executor_type=LOADING_EXECUTOR):
+    """
+    Calls function on every item using a pool of num_workers workers.
+
+    Args:
+        function (callable): The function to call. Must be picklable if executor_type 
+        is "process".
+
+        items (list): The arguments to call function with
+
+        num_workers (int): The number of workers. Items are processed one at a time
+        in the calling thread if num_workers is 1 or less.
+
+        executor_type (str): Either "thread" or "process". Defaults to LOADING_EXECUTOR.
+
+    Returns:
+        list: The results of calling function on each item in the order of items
+    """
+    if num_workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    executor_class = ThreadPoolExecutor
+    if executor_type == "process":
+        # Imported here because importing multiprocessing slows down starting the app
+        from concurrent.futures import ProcessPoolExecutor
+        executor_class = ProcessPoolExecutor
+    with executor_class(max_workers=min(num_workers, len(items))) as executor:
+        return list(executor.map(function, items))
+
+@timed_stage("build_df")
+def build_df_from_file_dfs(file_dfs, prev_data=None):
+    """
+    Formats the "Problem Detected" column of each file's DataFrame and concatenates 
+    them. file_dfs must be ordered from oldest to newest because the "Problem Detected"
+    status of a study depends on its file information from previous days. prev_data
+    provides the file information from before the oldest file and is updated with the
+    file information of the newest files.
+
+    Args:
+        file_dfs (list of pandas.DataFrame): DataFrames returned by read_csv_file() 
+        ordered from oldest to newest
+
+        prev_data (dict, optional): File information formatted like PREV_DATA. Defaults
+        to None, representing no previous data.
+
+    Returns:
+        pandas.DataFrame: The Pandas DataFrame built by concatenating file_dfs with
+        the newest date appearing last
+    """
+    prev_data = prev_data if prev_data is not None else {}
+    if not file_dfs:
+        return pd.DataFrame(columns=COLUMNS)
+
+    # Classify every file at once
+    combined_df = pd.concat(file_dfs, ignore_index=True)
+    problem_detected, new_prev_data = get_problem_detected_statuses(combined_df, prev_data=prev_data)
+    combined_df["Problem Detected"] = problem_detected
+
+    # Change previous "N: File Count" and "N: Total File Size (MB)" to the newest file's:
+    prev_data.update(new_prev_data)
+
+    # Lay rows out as if files were concatenated newest first and then reversed so the
+    # newest date appears last
+    file_lengths = np.array([len(file_df) for file_df in file_dfs])
+    file_ends = np.cumsum(file_lengths)
+    file_numbers = np.repeat(np.arange(len(file_dfs)), file_lengths)
+    positions_in_file = np.arange(len(combined_df)) - (file_ends - file_lengths)[file_numbers]
+    row_order = np.lexsort((-positions_in_file, file_numbers))
+
+    df = combined_df.iloc[row_order]
+    df.index = (len(combined_df) - file_ends[file_numbers] + positions_in_file)[row_order]
+
+    return df
+
+@timed_stage("stream_files")
+def build_df_from_csv_file_chunks(file_paths, chunk_rows=STREAMING_CHUNK_ROWS, prev_data=None):
+    """
+    Builds the same DataFrame as build_df_from_file_dfs(read_csv_files(file_paths))
+    while only parsing and classifying chunk_rows rows of a CSV file at a time. Each 
+    CSV file is read with read_reduced_csv_file() and classified with 
+    build_df_from_file_df_chunks(), so apart from the returned DataFrame, memory use 
+    depends on chunk_rows rather than the size of the CSV files. Columnar snapshots are
+    not read. prev_data provides the file information from before the oldest file and 
+    is updated with the file information of the newest files.
+
+    Args:
+        file_paths (list of str): paths to CSV files ordered from oldest to newest
+
+        chunk_rows (int): The number of rows parsed and classified at a time. Defaults
+        to STREAMING_CHUNK_ROWS.
+
+        prev_data (dict, optional): File information formatted like PREV_DATA. Defaults
+        to None, representing no previous data.
+
+    Returns:
+        pandas.DataFrame: The Pandas DataFrame built by concatenating the CSV files with
+        the newest date appearing last
+    """
+    return build_df_from_file_df_chunks((read_reduced_csv_file(file_path, chunk_rows=chunk_rows) for file_path in file_paths), 
+                                        chunk_rows=chunk_rows, prev_data=prev_data)
+
+@timed_stage("build_df")
+def build_df_from_file_df_chunks(file_dfs, chunk_rows=STREAMING_CHUNK_ROWS, prev_data=None):
+    """
+    Builds the same DataFrame as build_df_from_file_dfs() while classifying chunk_rows
+    rows of a file's DataFrame at a time, so classifying doesn't need memory for every
+    row at once. file_dfs are not modified, so they can be cached.
+
+    Args:
+        file_dfs (iterable of pandas.DataFrame): DataFrames returned by read_csv_file() 
+        or read_reduced_csv_file() ordered from oldest to newest
+
+        chunk_rows (int): The number of rows classified at a time. Defaults to 
+        STREAMING_CHUNK_ROWS.
+
+        prev_data (dict, optional): File information formatted like PREV_DATA. Defaults
+        to None, representing no previous data.
+
+    Returns:
+        pandas.DataFrame: The Pandas DataFrame built by concatenating file_dfs with
+        the newest date appearing last
+    """
+    prev_data = prev_data if prev_data is not None else {}
+    classified_file_dfs, reversed_statuses = [], []
+    for file_df in file_dfs:
+        if file_df.empty:
+            continue
+
+        # Every row of a file is compared with prev_data from before the file, which is 
+        # updated once the whole file is classified
+        date_string = file_df["Date"].iloc[0].strftime("%Y-%m-%d")
+        file_prev_data, file_statuses = {}, []
+        for start in range(0, len(file_df), chunk_rows):
+            chunk_df = file_df.iloc[start:start + chunk_rows]
+            chunk_study_ids = chunk_df["Study ID"].to_numpy()
+            # Only the file information of the chunk's own studies affects its statuses
+            chunk_prev_data = {study_id : prev_data[study_id] for study_id in pd.unique(chunk_study_ids) if study_id in prev_data}
+            problem_detected, chunk_new_prev_data = get_problem_detected_statuses(chunk_df, prev_data=chunk_prev_data)
+            file_statuses.append(intern_strings(problem_detected.to_numpy()))
+
+            updated_study_ids = chunk_study_ids[~get_is_weekly_not_run(chunk_df, date_string)]
+            file_prev_data.update((study_id, chunk_new_prev_data[study_id]) for study_id in pd.unique(updated_study_ids) 
+                                  if study_id in chunk_new_prev_data)
+
+        prev_data.update(file_prev_data)
+        classified_file_dfs.append(file_df)
+        reversed_statuses.append(np.concatenate(file_statuses)[::-1])
+
+    if not classified_file_dfs:
+        return pd.DataFrame(columns=COLUMNS)
+
+    # Rows are laid out as if every file was concatenated newest first and then reversed.
+    # Columns are joined from reversed views, so the rows are only copied once.
+    columns = {column : np.concatenate([file_df[column].to_numpy()[::-1] for file_df in classified_file_dfs]) 
+               for column in COLUMNS if column not in ("Occurrence", "Problem Detected")}
+    # Joining categorical columns keeps them categorical when every file has the same categories
+    columns["Occurrence"] = pd.concat([file_df["Occurrence"].iloc[::-1] for file_df in classified_file_dfs], ignore_index=True)
+    columns["Problem Detected"] = np.concatenate(reversed_statuses)
+    df = pd.DataFrame({column : columns[column] for column in COLUMNS}, copy=False)
+    df.index = np.arange(len(df))[::-1]
+
+    return df
+
+def read_reduced_csv_file(file_path, chunk_rows=STREAMING_CHUNK_ROWS):
+    """
+    Reads a CSV file into the same DataFrame as read_csv_file() while only parsing 
+    chunk_rows rows at a time. Before the next chunk is parsed, the strings of each chunk
+    are replaced by interned copies with intern_strings(), so repeated values such as 
+    run dates, run times, statuses, and Study IDs from other files are only stored once. 
+    Columnar snapshots are not read.
+
+    Args:
+        file_path (str): path to a CSV file
+
+        chunk_rows (int): The number of rows parsed at a time. Defaults to 
+        STREAMING_CHUNK_ROWS.
+
+    Returns:
+        pandas.DataFrame: The unformatted data associated with a single CSV file
+    """
+    string_columns = {column for column in COLUMNS_FROM_CSV_FILE if COLUMN_DTYPES[column] in (object, "category")}
+    reduced_chunks = {column : [] for column in COLUMNS}
+    for chunk_df in read_csv_file_in_chunks(file_path, chunk_rows):
+        for column in COLUMNS:
+            values = chunk_df[column].to_numpy()
+            reduced_chunks[column].append(intern_strings(values) if column in string_columns else values)
+
+    if not reduced_chunks["Study ID"]:
+        return read_csv_file(file_path, path_to_snapshot_directory=None)
+    file_df = pd.DataFrame({column : np.concatenate(chunks) for column, chunks in reduced_chunks.items()}, copy=False)
+    file_df["Occurrence"] = file_df["Occurrence"].astype("category")
+
+    return file_df
+
+def intern_strings(values):
+    """
+    Returns an array holding values with every string replaced by its interned copy, so
+    equal strings share one object. Interned strings are freed once nothing refers to them.
+
+    Args:
+        values (numpy.ndarray): An array of strings and missing values
+
+    Returns:
+        numpy.ndarray: An object array equal to values. Missing values become NaN.
+    """
+    codes, unique_values = pd.factorize(values)
+    # Missing values have the code -1, which selects the NaN at the end
+    interned_values = np.array([sys.intern(value) if isinstance(value, str) else value for value in unique_values] + [np.nan], dtype=object)
+
+    return interned_values[codes]
+
+def read_csv_file_in_chunks(file_path, chunk_rows=STREAMING_CHUNK_ROWS):
+    """
+    Reads a CSV file like read_csv_file() chunk_rows rows at a time.
+
+    Args:
+        file_path (str): path to a CSV file
+
+        chunk_rows (int): The number of rows in each chunk. Defaults to 
+        STREAMING_CHUNK_ROWS.
+
+    Yields:
+        pandas.DataFrame: The unformatted data associated with the next rows of the 
+        CSV file. "Occurrence" is not categorical because each chunk may hold different 
+        categories.
+    """
+    date = get_date_of_file(file_path)
+    chunk_dtypes = dict(COLUMN_DTYPES, Occurrence=object)
+    with pd.read_csv(file_path, usecols=COLUMNS_FROM_CSV_FILE, dtype=chunk_dtypes, chunksize=chunk_rows) as chunk_reader:
+        for chunk_df in chunk_reader:
+            chunk_df = chunk_df.loc[:, COLUMNS_FROM_CSV_FILE]
+            chunk_df.insert(loc=1, column="Date", value=date)
+            yield chunk_df
+
+def get_cached_problem_detected_data(path_to_csv_directory=DATA_DIRECTORY, start_date=None, end_date=None, prefix="",
+                                     path_to_study_state=None):
+    """
+    Returns the DataFrame built from the CSV files in a data directory dated between
+    start_date and end_date along with its problem_detected_df, reusing the results of 
+    previous calls. The CSV files between start_date and end_date are checked on every 
+    call, and the cached results are only rebuilt when their names, modification times,
+    or sizes differ from the cached ones, so CSV files rewritten in place are noticed 
+    too. When rebuilding, only CSV files that were not read before are parsed. When 
+    STREAMING_CHUNK_ROWS is positive, they are read with read_reduced_csv_file() and 
+    classified STREAMING_CHUNK_ROWS rows at a time. When STUDY_STATE_STORE is True, 
+    studies start from their file information in the study state store rather than 
+    from no previous data, the store is updated with new CSV files, and the cached 
+    results are also rebuilt when get_study_state_version() changes. Results for the 
+    MAX_CACHED_WINDOWS most recently built date ranges are kept for each data directory
+    and prefix, which are built under their own lock.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        start_date (datetime.date, optional): The oldest date. Defaults to DAYS_IN_MONTH - 1 
+        days before end_date.
+
+        end_date (datetime.date, optional): The newest date. Defaults to the date of the 
+        newest CSV file.
+
+        prefix (str): The prefix of the names of the CSV files. Defaults to "", which 
+        includes every CSV file.
+
+        path_to_study_state (str, optional): path to the study state database. Defaults 
+        to STUDY_STATE_PATH.
+
+    Returns:
+        (pandas.DataFrame, pandas.DataFrame): Returns a tuple of the DataFrame built
+        from the CSV files in the data directory and its problem_detected_df. Callers
+        must not modify either DataFrame.
+    """
+    path_to_study_state = path_to_study_state if path_to_study_state is not None else STUDY_STATE_PATH
+    cache_key = (path_to_csv_directory, prefix)
+    window = (start_date, end_date)
+    csv_files = get_csv_files_between_dates(path_to_csv_directory, start_date=start_date, end_date=end_date, prefix=prefix)
+    # A window holds about DAYS_IN_MONTH files, so checking each of them is cheap
+    fingerprint = get_csv_files_fingerprint(path_to_csv_directory, csv_files)
+    # The stored file information the oldest date is classified against may change too
+    study_state_version = get_study_state_version(fingerprint, path_to_study_state)
+    cache_entry = DATASET_CACHE.get(cache_key)
+    window_entry = cache_entry["windows"].get(window) if cache_entry is not None else None
+    if window_entry is not None and (window_entry["fingerprint"], window_entry["study_state_version"]) == (fingerprint, study_state_version):
+        return (window_entry["df"], window_entry["problem_detected_df"])
+
+    with DATASET_CACHE_LOCK:
+        cache_entry = DATASET_CACHE.setdefault(cache_key, {"file_dfs" : {}, "windows" : OrderedDict(), "lock" : threading.Lock()})
+
+    with cache_entry["lock"]:
+        # Another thread may have rebuilt the cache while this one was waiting
+        window_entry = cache_entry["windows"].get(window)
+        if window_entry is not None and (window_entry["fingerprint"], window_entry["study_state_version"]) == (fingerprint, study_state_version):
+            return (window_entry["df"], window_entry["problem_detected_df"])
+
+        # Builds never share file information, so concurrent builds can't interfere
+        prev_data = {}
+        if STUDY_STATE_STORE_ENABLED and fingerprint:
+            # Start from each study's stored file information instead of replaying older dates
+            prev_data = read_study_state(get_date_of_file(fingerprint[0][0]), path_to_study_state)
+        baseline_prev_data = dict(prev_data)
+
+        # Only parse CSV files that are new or changed since they were last read
+        file_dfs = cache_entry["file_dfs"]
+        new_files = [(file, file_mtime, file_size) for file, file_mtime, file_size in fingerprint 
+                     if file not in file_dfs or file_dfs[file][0] != (file_mtime, file_size)]
+        new_file_paths = [os.path.join(path_to_csv_directory, file) for file, _, _ in new_files]
+        if STREAMING_CHUNK_ROWS > 0:
+            new_file_dfs = [read_reduced_csv_file(file_path, chunk_rows=STREAMING_CHUNK_ROWS) for file_path in new_file_paths]
+        else:
+            new_file_dfs = read_csv_files(new_file_paths)
+        for (file, file_mtime, file_size), new_file_df in zip(new_files, new_file_dfs):
+            file_dfs[file] = ((file_mtime, file_size), new_file_df)
+
+        window_file_dfs = [file_dfs[file][1] for file, _, _ in fingerprint]
+        if STREAMING_CHUNK_ROWS > 0:
+            df = build_df_from_file_df_chunks(window_file_dfs, chunk_rows=STREAMING_CHUNK_ROWS, prev_data=prev_data)
+        else:
+            df = build_df_from_file_dfs(window_file_dfs, prev_data=prev_data)
+
+        if STUDY_STATE_STORE_ENABLED:
+            # Rows of each date appear in the reverse of their CSV file's order in df
+            unrecorded_files = get_unrecorded_study_state_files([os.path.join(path_to_csv_directory, file) for file, _, _ in fingerprint],
+                                                                path_to_study_state)
+            write_study_state(df.iloc[::-1], unrecorded_files, path_to_study_state)
+
+        problem_detected_df = get_problem_detected_df(df)
+        # Identifies the data behind problem_detected_df so that rendered HTML can be cached
+        problem_detected_df.attrs["data_version"] = get_data_version(path_to_csv_directory, fingerprint, baseline_prev_data)
+        # When the newest of these CSV files was modified, in whole seconds since the epoch
+        problem_detected_df.attrs["data_modified"] = max((file_mtime for _, file_mtime, _ in fingerprint), default=0) // 10**9
+
+        cache_entry["windows"][window] = {"fingerprint" : fingerprint, "study_state_version" : study_state_version, "df" : df, 
+                                          "problem_detected_df" : problem_detected_df}
+        cache_entry["windows"].move_to_end(window)
+        evict_least_recently_used_windows(cache_entry["windows"])
+
+        # Keep only the files used by cached date ranges
+        cached_files = {file for window_entry in cache_entry["windows"].values() for file, _, _ in window_entry["fingerprint"]}
+        for file in list(file_dfs):
+            if file not in cached_files:
+                del file_dfs[file]
+    
+    return (df, problem_detected_df)
+
+def evict_least_recently_used_windows(cache, get_window=None):
+    """
+    Removes the least recently used entries of a cache ordered from least to most 
+    recently used until at most MAX_CACHED_WINDOWS remain. The most recently used entry 
+    for the current month, which "/" and "/today" display, is never removed, so requests
+    for other date ranges can't evict it.
+
+    Args:
+        cache (collections.OrderedDict): The cache
+
+        get_window (function, optional): Returns the (start_date, end_date) tuple of a 
+        cache key. Defaults to None, meaning the keys are date ranges.
+    """
+    get_window = get_window if get_window is not None else (lambda key : key)
+    current_month = get_current_month_date_range()
+    pinned_key = next((key for key in reversed(cache) if get_window(key) == current_month), None)
+    for key in list(cache):
+        if len(cache) <= MAX_CACHED_WINDOWS:
+            break
+        if key != pinned_key:
+            del cache[key]
+
+def get_data_version(path_to_csv_directory, fingerprint, prev_data=None):
+    """
+    Returns a short string that changes whenever the CSV files behind a DataFrame change.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        fingerprint (tuple): The fingerprint of the CSV files returned by
+        get_csv_files_fingerprint()
+
+        prev_data (dict, optional): The file information the DataFrame's oldest date was 
+        classified against, formatted like PREV_DATA. Defaults to None, representing no
+        previous data.
+
+    Returns:
+        str: The data version of the CSV files
+    """
+    version_key = (path_to_csv_directory, fingerprint)
+    if prev_data:
+        version_key += (sorted(prev_data.items()),)
+
+    return hashlib.sha1(repr(version_key).encode()).hexdigest()[:16]
+
+def get_study_state_version(fingerprint, path_to_study_state=STUDY_STATE_PATH):
+    """
+    Returns the version of the file information in the study state store that the 
+    oldest of the CSV files in a fingerprint is classified against, see 
+    read_study_state_version().
+
+    Args:
+        fingerprint (tuple): The fingerprint of the CSV files returned by
+        get_csv_files_fingerprint()
+
+        path_to_study_state (str): path to the study state database
+
+    Returns:
+        int: The version, or None if STUDY_STATE_STORE is False or there are no CSV files
+    """
+    if not STUDY_STATE_STORE_ENABLED or not fingerprint:
+        return None
+    return read_study_state_version(get_date_of_file(fingerprint[0][0]), path_to_study_state)
+
+def get_csv_files_fingerprint(path_to_csv_directory, csv_files):
+    """
+    Returns a fingerprint of CSV files in a data directory.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        csv_files (list of str): The names of CSV files in the data directory
+
+    Returns:
+        tuple of (str, int, int): The name, modification time in nanoseconds, and size 
+        in bytes of each CSV file in the order of csv_files
+    """
+    fingerprint = []
+    for file in csv_files:
+        file_stat = os.stat(os.path.join(path_to_csv_directory, file))
+        fingerprint.append((file, file_stat.st_mtime_ns, file_stat.st_size))
+
+    return tuple(fingerprint)
+
+# Data Sources:
+def register_data_source(name, path_to_csv_directory, prefix="", path_to_study_state=None):
+    """
+    Adds a data source to DATA_SOURCES, replacing any source with the same name. Each
+    source is loaded and cached on its own by get_multi_source_problem_detected_data().
+
+    Args:
+        name (str): The name of the source, which prefixes its Study IDs in merged data
+
+        path_to_csv_directory (str): path to directory containing the source's CSV files
+
+        prefix (str): The prefix of the names of the source's CSV files, such as 
+        "NRG_N_TODAY_COMP_". Defaults to "", which includes every CSV file in the directory.
+
+        path_to_study_state (str, optional): path to the source's study state database. 
+        Defaults to STUDY_STATE_PATH with the source's name appended, so sources that 
+        share Study IDs don't share file information.
+    """
+    if not name or SOURCE_SEPARATOR in name:
+        raise ValueError(f"Data source names must be non-empty and can't contain {SOURCE_SEPARATOR!r}: {name!r}")
+
+    if path_to_study_state is None:
+        study_state_root, study_state_extension = os.path.splitext(STUDY_STATE_PATH)
+        path_to_study_state = f"{study_state_root}_{name}{study_state_extension}"
+    DATA_SOURCES[name] = {"path_to_csv_directory" : path_to_csv_directory, "prefix" : prefix, 
+                          "path_to_study_state" : path_to_study_state}
+
+def get_data_sources():
+    """
+    Returns the registered data sources. Sources in the DATA_SOURCES_SPEC environment 
+    variable are registered the first time this is called.
+
+    Returns:
+        dict: A dictionary mapping the name of each source to a dictionary with the keys
+        "path_to_csv_directory", "prefix", and "path_to_study_state". Empty if only 
+        DATA_DIRECTORY is read.
+    """
+    with SOURCE_LOADING_LOCK:
+        if DATA_SOURCES_SPEC and not DATA_SOURCES:
+            for data_source in filter(None, (spec.strip() for spec in DATA_SOURCES_SPEC.split(","))):
+                name, _, location = data_source.partition("=")
+                path_to_csv_directory, prefix = parse_data_source_location(location.strip())
+                register_data_source(name.strip(), path_to_csv_directory, prefix)
+
+    return DATA_SOURCES
+
+def parse_data_source_location(location):
+    """
+    Splits the "directory:prefix" part of a data source in DATA_SOURCES_SPEC. Directories
+    may contain ":", such as Windows drive letters, so the prefix follows the last ":".
+    File name prefixes can't contain path separators, so text after the last ":" that 
+    does belongs to the directory, as in "C:\\data". A directory whose last part contains
+    ":" and has no prefix needs a trailing ":", as in "/mnt/feed:b:".
+
+    Args:
+        location (str): The directory and optional prefix of a data source
+
+    Returns:
+        (str, str): Returns a tuple of the path to the data directory and the prefix,
+        which is "" if there is none
+    """
+    path_to_csv_directory, separator, prefix = location.rpartition(":")
+    if not separator or "/" in prefix or "\\" in prefix:
+        return (location, "")
+    return (path_to_csv_directory.strip(), prefix.strip())
+
+def get_multi_source_problem_detected_data(start_date=None, end_date=None, data_sources=None, 
+                                           timeout_seconds=SOURCE_LOADING_TIMEOUT_SECONDS):
+    """
+    Returns the DataFrame and problem_detected_df of several data sources merged into
+    one. Sources are loaded in parallel on SOURCE_LOADING_WORKERS threads, each with
+    get_cached_problem_detected_data(), so every source is cached on its own and only 
+    reads its new CSV files. A source that takes longer than timeout_seconds, or fails,
+    is merged with the data it last loaded for the same dates while its load continues
+    in the background, so a slow source doesn't hold back the others. Only sources that
+    never loaded these dates are waited for, and those that fail are left out of the 
+    merged data unless every source fails.
+
+    Args:
+        start_date (datetime.date, optional): The oldest date. Defaults to DAYS_IN_MONTH - 1 
+        days before end_date.
+
+        end_date (datetime.date, optional): The newest date. Defaults to the date of the 
+        newest CSV file of each source.
+
+        data_sources (dict, optional): The sources to merge, formatted like the dictionary
+        returned by get_data_sources(). Defaults to the registered sources.
+
+        timeout_seconds (float): The number of seconds to wait for sources that loaded 
+        these dates before.
+
+    Returns:
+        (pandas.DataFrame, pandas.DataFrame): Returns a tuple of the merged DataFrame and
+        its problem_detected_df, as returned by merge_source_data(). Callers must not 
+        modify either DataFrame.
+    """
+    data_sources = data_sources if data_sources is not None else get_data_sources()
+    window = (start_date, end_date)
+    loads = {name : start_source_load(name, data_source, window) for name, data_source in data_sources.items()}
+    futures.wait(loads.values(), timeout=timeout_seconds)
+
+    source_data, stale_sources, failed_sources = {}, [], []
+    for name, load in loads.items():
+        last_source_data = LAST_SOURCE_DATA.get(name, {}).get(window)
+        if last_source_data is not None and (not load.done() or load.exception() is not None):
+            source_data[name] = last_source_data
+            stale_sources.append(name)
+        elif load.exception() is not None:
+            failed_sources.append(name)
+        else:
+            source_data[name] = load.result()
+
+    if failed_sources and not source_data:
+        raise loads[failed_sources[0]].exception()
+    return merge_source_data(source_data, stale_sources, failed_sources=failed_sources, window=window)
+
+def start_source_load(name, data_source, window):
+    """
+    Starts loading a data source's data for a date range on the source loading threads,
+    unless it is already being loaded.
+
+    Args:
+        name (str): The name of the source
+
+        data_source (dict): The source, formatted like the values returned by 
+        get_data_sources()
+
+        window (tuple): The oldest and newest dates, either of which may be None
+
+    Returns:
+        concurrent.futures.Future: The load, which results in the tuple returned by 
+        get_cached_problem_detected_data()
+    """
+    with SOURCE_LOADING_LOCK:
+        load = SOURCE_LOADS.get((name, window))
+        if load is None:
+            if SOURCE_LOADER["executor"] is None:
+                SOURCE_LOADER["executor"] = ThreadPoolExecutor(max_workers=SOURCE_LOADING_WORKERS, thread_name_prefix="source")
+            load = SOURCE_LOADER["executor"].submit(load_data_source, name, data_source, window)
+            SOURCE_LOADS[(name, window)] = load
+
+    return load
+
+def load_data_source(name, data_source, window):
+    """
+    Loads a data source's data for a date range with get_cached_problem_detected_data()
+    and keeps it as the source's last loaded data for the MAX_CACHED_WINDOWS most 
+    recently loaded date ranges.
+
+    Args:
+        name (str): The name of the source
+
+        data_source (dict): The source, formatted like the values returned by 
+        get_data_sources()
+
+        window (tuple): The oldest and newest dates, either of which may be None
+
+    Returns:
+        (pandas.DataFrame, pandas.DataFrame): The tuple returned by 
+        get_cached_problem_detected_data()
+    """
+    try:
+        data = get_cached_problem_detected_data(data_source["path_to_csv_directory"], start_date=window[0], end_date=window[1],
+                                                prefix=data_source["prefix"], path_to_study_state=data_source["path_to_study_state"])
+        with SOURCE_LOADING_LOCK:
+            last_source_data = LAST_SOURCE_DATA.setdefault(name, OrderedDict())
+            last_source_data[window] = data
+            last_source_data.move_to_end(window)
+            evict_least_recently_used_windows(last_source_data)
+        return data
+    except Exception as exception:
+        print(f"Failed to load data source {name}: {exception!r}")
+        raise
+    finally:
+        with SOURCE_LOADING_LOCK:
+            SOURCE_LOADS.pop((name, window), None)
+
+def merge_source_data(source_data, stale_sources=(), failed_sources=(), window=(None, None)):
+    """
+    Merges the data of several data sources. Each Study ID is prefixed with its source's
+    name and SOURCE_SEPARATOR, such as "site_a:STUDY1", so studies with the same id in 
+    different sources stay apart and the index stays a single level of strings that 
+    pages, links, and the status API already handle. Dates missing from a source are 
+    encoded as missing statuses. Merged data is cached by the data versions of its sources.
+
+    Args:
+        source_data (dict): A dictionary mapping the name of each source to the tuple 
+        returned by get_cached_problem_detected_data()
+
+        stale_sources (iterable of str): The names of the sources whose data is older than
+        their CSV files
+
+        failed_sources (iterable of str): The names of the sources that failed to load
+        and are left out
+
+        window (tuple): The oldest and newest dates of the data. Defaults to 
+        (None, None).
+
+    Returns:
+        (pandas.DataFrame, pandas.DataFrame): Returns a tuple of the merged DataFrame and
+        its problem_detected_df. The problem_detected_df's attrs hold its "data_version", 
+        the newest "data_modified" of its sources, its "stale_sources", and its 
+        "failed_sources".
+    """
+    merge_key = (tuple((name, problem_detected_df.attrs.get("data_version")) for name, (_, problem_detected_df) in sorted(source_data.items())),
+                 tuple(sorted(stale_sources)), tuple(sorted(failed_sources)))
+    merged_data_key = (window, merge_key)
+    with SOURCE_LOADING_LOCK:
+        merged_data = MERGED_DATA_CACHE.get(merged_data_key)
+        if merged_data is not None:
+            MERGED_DATA_CACHE.move_to_end(merged_data_key)
+            return merged_data
+
+    dates = pd.Index(sorted(set().union(*(problem_detected_df.columns for _, problem_detected_df in source_data.values()))), dtype=object, name="Date")
+    dfs, study_ids, codes = [], [], []
+    for name, (df, problem_detected_df) in sorted(source_data.items()):
+        source_prefix = name + SOURCE_SEPARATOR
+        dfs.append(df.assign(**{"Study ID" : source_prefix + df["Study ID"]}))
+        study_ids.extend(source_prefix + str(study_id) for study_id in problem_detected_df.index)
+
+        source_codes = problem_detected_df.to_numpy()
+        source_codes = source_codes if source_codes.dtype == np.uint8 else encode_statuses(source_codes)
+        # Dates a source has no CSV file for stay 0, the code of a missing status
+        merged_source_codes = np.zeros((len(source_codes), len(dates)), dtype=np.uint8)
+        merged_source_codes[:, dates.get_indexer(problem_detected_df.columns)] = source_codes
+        codes.append(merged_source_codes)
+
+    df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=COLUMNS)
+    codes = np.concatenate(codes) if codes else np.zeros((0, len(dates)), dtype=np.uint8)
+    study_ids = np.array(study_ids, dtype=object)
+    study_order = np.argsort(study_ids, kind="stable")
+    problem_detected_df = pd.DataFrame(codes[study_order], index=pd.Index(study_ids[study_order], name="Study ID"), columns=dates, copy=False)
+    problem_detected_df.attrs["data_version"] = hashlib.sha1(repr(merge_key).encode()).hexdigest()[:16]
+    problem_detected_df.attrs["data_modified"] = max((source_problem_detected_df.attrs.get("data_modified", 0) 
+                                                      for _, source_problem_detected_df in source_data.values()), default=0)
+    problem_detected_df.attrs["stale_sources"] = list(merge_key[1])
+    problem_detected_df.attrs["failed_sources"] = list(merge_key[2])
+
+    with SOURCE_LOADING_LOCK:
+        MERGED_DATA_CACHE[merged_data_key] = (df, problem_detected_df)
+        evict_least_recently_used_windows(MERGED_DATA_CACHE, get_window=lambda key : key[0])
+    return (df, problem_detected_df)
+
+# Columnar Snapshots of CSV Files:
+def ingest_csv_files_to_snapshots(path_to_csv_directory=DATA_DIRECTORY, path_to_snapshot_directory=SNAPSHOT_DIRECTORY, prefix=""):
+    """
+    Converts every CSV file in a data directory's get_file_index() without an up-to-date
+    snapshot into a typed columnar snapshot. Other files and subdirectories, such as 
+    the directory of another data source, are skipped. Snapshots are Parquet files with the same name as their 
+    CSV file, so the snapshot directory holds one partition per date. Only the columns
+    in COLUMNS are stored: "Date" as datetime64, "Occurrence" as a category, and 
+    "N: File Count" and "N: Total File Size (MB)" as floats.
+
+    Args:
+        path_to_csv_directory (str): path to directory containing CSV files
+
+        path_to_snapshot_directory (str): path to directory that snapshots are written to
+
+        prefix (str): The prefix of the names of the CSV files. Defaults to "", which 
+        includes every CSV file.
+
+    Returns:
+        list of str: The names of the CSV files that snapshots were written for
+    """
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("pyarrow must be installed to write columnar snapshots")
+
+    ingested_files = []
+    file_index = get_file_index(path_to_csv_directory, prefix=prefix)
+    for file in (file_index["files"][date] for date in file_index["dates"]):
+        file_path = os.path.join(path_to_csv_directory, file)
+        if not os.path.isfile(file_path):
+            continue
+        snapshot_path = get_snapshot_path(file_path, path_to_snapshot_directory)
+        if is_snapshot_current(file_path, snapshot_path):
+            continue
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+
+        snapshot_df = read_csv_file(file_path, path_to_snapshot_directory=None)
+        snapshot_df["Date"] = pd.to_datetime(snapshot_df["Date"])
+
+        # Write to a temporary file first so readers never see a partially written snapshot
+        temporary_snapshot_path = snapshot_path + ".tmp"
+        snapshot_df.to_parquet(temporary_snapshot_path, engine="pyarrow", index=False, schema=get_snapshot_schema())
+        os.replace(temporary_snapshot_path, snapshot_path)
+        ingested_files.append(file)
+    
+    return ingested_files
+
+def get_snapshot_path(file_path, path_to_snapshot_directory=SNAPSHOT_DIRECTORY):
     """
-    Constructs a Pandas DataFrame from CSV files in a data directory. The columns of this 
-    DataFrame are: "Study ID", "Date", "Occurrence", "Problem Detected", "Last Successful
-    Run Date", "Last Successful Run Time", "Next Run Date", "Next Run Time", 
-    "N: File Count", and "N: Total File Size (MB)".
+    Returns the path of the columnar snapshot associated with a CSV file. Snapshots are
+    grouped by the name of the directory containing their CSV file followed by a hash of 
+    its absolute path, so directories with the same name never share snapshots.
+
+    Args:
+        file_path (str): path to a CSV file
+
+        path_to_snapshot_directory (str): path to directory containing columnar snapshots.
+        If None, returns None.
+
+    Returns:
+        str: The path of the CSV file's snapshot
+    """
+    if path_to_snapshot_directory is None:
+        return None
+    
+    csv_directory = os.path.dirname(os.path.abspath(file_path))
+    csv_directory_name = f"{os.path.basename(csv_directory)}-{hashlib.sha1(csv_directory.encode()).hexdigest()[:12]}"
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(path_to_snapshot_directory, csv_directory_name, file_name + SNAPSHOT_EXTENSION)
+
+def get_snapshot_schema():
+    """
+    Returns the pyarrow schema of columnar snapshots. Every snapshot shares this schema,
+    even when a column is empty in its CSV file, so snapshots can be read together.
+
+    Returns:
+        pyarrow.Schema: The schema of columnar snapshots
+    """
+    import pyarrow
+
+    column_types = {"Date" : pyarrow.timestamp("ns"), "Occurrence" : pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+                    "N: File Count" : pyarrow.float64(), "N: Total File Size (MB)" : pyarrow.float64()}
+    
+    return pyarrow.schema([(column, column_types.get(column, pyarrow.string())) for column in COLUMNS])
+
+def is_snapshot_current(file_path, snapshot_path):
+    """
+    Checks if a CSV file's columnar snapshot can be read in place of the CSV file.
+
+    Args:
+        file_path (str): path to a CSV file
+
+        snapshot_path (str): path to the CSV file's snapshot
+
+    Returns:
+        bool: True if pyarrow is installed and the snapshot exists and is at least as 
+        new as the CSV file. False otherwise.
+    """
+    if not PARQUET_AVAILABLE or snapshot_path is None or not os.path.exists(snapshot_path):
+        return False
     
+    return os.stat(snapshot_path).st_mtime_ns >= os.stat(file_path).st_mtime_ns
+
+def read_snapshot_file(snapshot_path):
+    """
+    Reads a columnar snapshot into a Pandas DataFrame formatted like the DataFrames
+    returned by read_csv_file().
+
+    Args:
+        snapshot_path (str): path to a snapshot written by ingest_csv_files_to_snapshots()
+
+    Returns:
+        pandas.DataFrame: The unformatted data associated with a single CSV file
+    """
+    snapshot_df = pd.read_parquet(snapshot_path, engine="pyarrow", columns=COLUMNS)
+    snapshot_df["Date"] = snapshot_df["Date"].dt.date
+
+    return snapshot_df
+
+def read_snapshot_files(snapshot_paths):
+    """
+    Reads several columnar snapshots in a single pass, which avoids the overhead of 
+    opening each small daily snapshot on its own.
+
+    Args:
+        snapshot_paths (list of str): paths to snapshots written by 
+        ingest_csv_files_to_snapshots(), one per date
+
+    Returns:
+        list of pandas.DataFrame: The unformatted data associated with each snapshot in
+        the order of snapshot_paths
+    """
+    if len(snapshot_paths) <= 1:
+        return [read_snapshot_file(snapshot_path) for snapshot_path in snapshot_paths]
+
+    import pyarrow
+    import pyarrow.parquet
+    try:
+        snapshots_df = pyarrow.parquet.read_table(snapshot_paths, columns=COLUMNS).to_pandas()
+    except pyarrow.ArrowException:
+        # Snapshots with differing schemas can still be read one at a time
+        return [read_snapshot_file(snapshot_path) for snapshot_path in snapshot_paths]
+    snapshots_df["Date"] = snapshots_df["Date"].dt.date
+
+    # Each snapshot holds a single date, so a snapshot ends wherever the date changes
+    dates = snapshots_df["Date"].to_numpy()
+    snapshot_starts = np.concatenate(([0], np.flatnonzero(dates[1:] != dates[:-1]) + 1))
+    snapshot_ends = np.append(snapshot_starts[1:], len(snapshots_df))
+    if len(snapshot_starts) != len(snapshot_paths):
+        return [read_snapshot_file(snapshot_path) for snapshot_path in snapshot_paths]
+
+    return [snapshots_df.iloc[start:end].reset_index(drop=True) for start, end in zip(snapshot_starts, snapshot_ends)]
+
+# Study State Store:
+def connect_study_state_store(path_to_study_state=STUDY_STATE_PATH):
+    """
+    Opens a connection to the SQLite database that stores each study's "N: File Count" 
+    and "N: Total File Size (MB)" after every date, creating it if needed. Every call 
+    opens its own connection, so threads and processes never share one. SQLite's file
+    locks serialize writers, and write-ahead logging lets readers continue while a 
+    writer commits.
+
+    Args:
+        path_to_study_state (str): path to the study state database
+
+    Returns:
+        sqlite3.Connection: A connection in autocommit mode. Close it when done.
+    """
+    study_state_directory = os.path.dirname(path_to_study_state)
+    if study_state_directory:
+        os.makedirs(study_state_directory, exist_ok=True)
+
+    connection = sqlite3.connect(path_to_study_state, timeout=STUDY_STATE_TIMEOUT_SECONDS, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("""CREATE TABLE IF NOT EXISTS study_state (study_id TEXT NOT NULL, date TEXT NOT NULL, 
+                          file_count REAL, total_file_size REAL, PRIMARY KEY (study_id, date)) WITHOUT ROWID""")
+    connection.execute("CREATE INDEX IF NOT EXISTS study_state_date ON study_state (date)")
+    connection.execute("CREATE TABLE IF NOT EXISTS studies (study_id TEXT PRIMARY KEY) WITHOUT ROWID")
+    connection.execute("""CREATE TABLE IF NOT EXISTS recorded_files (file_path TEXT PRIMARY KEY, file_mtime INTEGER NOT NULL, 
+                          file_size INTEGER NOT NULL)""")
+    # Each recorded date gets a higher version than every date recorded before it
+    connection.execute("CREATE TABLE IF NOT EXISTS study_state_versions (date TEXT PRIMARY KEY, version INTEGER NOT NULL) WITHOUT ROWID")
+    return connection
+
+def seed_study_state(path_to_csv_directory=DATA_DIRECTORY, path_to_study_state=STUDY_STATE_PATH, prefix=""):
+    """
+    Records the file information in every CSV file of a data directory that isn't in 
+    the study state store yet, in a single pass and a single transaction. Seeding from
+    a cold data directory lets the first date range built afterwards be classified 
+    without replaying older dates.
+
     Args:
         path_to_csv_directory (str): path to directory containing CSV files
-        testing (bool): True if testing, False otherwise.
+
+        path_to_study_state (str): path to the study state database
+
+        prefix (str): The prefix of the names of the CSV files to record. Defaults to "",
+        which records every CSV file.
 
     Returns:
-        pandas.DataFrame: The Pandas DataFrame built by concatenating CSV files in the 
-        data directory
+        list of str: The names of the CSV files that were recorded
     """
-    if testing:
-        add_test_data_to_prev_data()
-    else:
-        global PREV_DATA
-        PREV_DATA = {}
+    file_index = get_file_index(path_to_csv_directory, prefix=prefix)
+    csv_file_paths = [os.path.join(path_to_csv_directory, file_index["files"][date]) for date in file_index["dates"]]
+    unrecorded_files = get_unrecorded_study_state_files(csv_file_paths, path_to_study_state)
+    if not unrecorded_files:
+        return []
 
-    df = pd.DataFrame()
-    csv_files = os.listdir(path_to_csv_directory)
-    # Order of csv_files could differ based on OS
-    csv_files.sort()
-    for file in csv_files[-DAYS_IN_MONTH:]:
+    file_dfs = read_csv_files([file_path for file_path, _, _ in unrecorded_files])
+    write_study_state(pd.concat(file_dfs, ignore_index=True), unrecorded_files, path_to_study_state)
 
-        # Build current_file_df
-        file_path = os.path.join(path_to_csv_directory, file)
-        date = get_date_of_file(file_path)
-        current_file_df = pd.read_csv(file_path)
-        current_file_df = current_file_df.loc[:,COLUMNS_FROM_CSV_FILE]
-        
-        # Insert date into current file's DataFrame
-        current_file_df.insert(loc=1, column="Date", value=date)
+    return [os.path.basename(file_path) for file_path, _, _ in unrecorded_files]
+
+def get_unrecorded_study_state_files(file_paths, path_to_study_state=STUDY_STATE_PATH):
+    """
+    Returns the CSV files that are missing from the study state store or changed since 
+    they were recorded.
+
+    Args:
+        file_paths (list of str): paths to CSV files
+
+        path_to_study_state (str): path to the study state database
+
+    Returns:
+        list of (str, int, int): The path, modification time in nanoseconds, and size 
+        in bytes of each unrecorded CSV file in the order of file_paths
+    """
+    with closing(connect_study_state_store(path_to_study_state)) as connection:
+        recorded_files = {file_path : (file_mtime, file_size) for file_path, file_mtime, file_size 
+                          in connection.execute("SELECT file_path, file_mtime, file_size FROM recorded_files")}
+
+    unrecorded_files = []
+    for file_path in file_paths:
+        file_stat = os.stat(file_path)
+        if recorded_files.get(os.path.abspath(file_path)) != (file_stat.st_mtime_ns, file_stat.st_size):
+            unrecorded_files.append((file_path, file_stat.st_mtime_ns, file_stat.st_size))
+
+    return unrecorded_files
+
+def write_study_state(df, csv_files, path_to_study_state=STUDY_STATE_PATH):
+    """
+    Records each study's file information after the dates of csv_files, replacing 
+    anything recorded for those dates before. Everything is written in one transaction,
+    so readers see either all of it or none of it.
+
+    Args:
+        df (pandas.DataFrame): DataFrame with the columns in COLUMNS_FROM_CSV_FILE and
+        "Date" holding the rows of csv_files. Rows sharing a date must be in the order
+        they appear in their CSV file.
+
+        csv_files (list of (str, int, int)): The CSV files returned by 
+        get_unrecorded_study_state_files()
+
+        path_to_study_state (str): path to the study state database
+    """
+    if not csv_files:
+        return
+
+    date_strings_of_files = [get_date_of_file(file_path).strftime("%Y-%m-%d") for file_path, _, _ in csv_files]
+    df = df[df["Date"].isin([get_date_of_file(file_path) for file_path, _, _ in csv_files])]
+    date_codes, unique_dates = pd.factorize(df["Date"])
+    date_strings = np.array([date.strftime("%Y-%m-%d") for date in unique_dates], dtype=object)[date_codes]
+
+    # Weekly studies that didn't run on a date keep their file information from before it
+    is_update = ~get_is_weekly_not_run(df, date_strings)
+    updates_df = pd.DataFrame({"Study ID" : df["Study ID"].to_numpy()[is_update], "Date" : date_strings[is_update],
+                               "N: File Count" : df["N: File Count"].to_numpy()[is_update],
+                               "N: Total File Size (MB)" : df["N: Total File Size (MB)"].to_numpy()[is_update]})
+    # Only the last row of a study on a date is visible on later dates
+    updates_df = updates_df.drop_duplicates(["Study ID", "Date"], keep="last")
+
+    with closing(connect_study_state_store(path_to_study_state)) as connection, connection:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany("DELETE FROM study_state WHERE date = ?", [(date_string,) for date_string in date_strings_of_files])
+        # SQLite stores missing values (NaN) as NULL
+        connection.executemany("INSERT INTO study_state VALUES (?, ?, ?, ?)", updates_df.itertuples(index=False, name=None))
+        connection.executemany("INSERT OR IGNORE INTO studies VALUES (?)", [(study_id,) for study_id in updates_df["Study ID"].unique()])
+        connection.executemany("INSERT OR REPLACE INTO recorded_files VALUES (?, ?, ?)", 
+                               [(os.path.abspath(file_path), file_mtime, file_size) for file_path, file_mtime, file_size in csv_files])
+        version = connection.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM study_state_versions").fetchone()[0]
+        connection.executemany("INSERT OR REPLACE INTO study_state_versions VALUES (?, ?)", 
+                               [(date_string, version) for date_string in date_strings_of_files])
+
+def read_study_state(date, path_to_study_state=STUDY_STATE_PATH):
+    """
+    Returns each study's file information from before a date, as if every recorded
+    date before it had been replayed.
 
-        # Format "Problem Detected" Column:
-        current_file_df["Problem Detected"] = current_file_df.apply(format_problem_detected_column, axis=1)
+    Args:
+        date (datetime.date): The date to read file information from before
+
+        path_to_study_state (str): path to the study state database
+
+    Returns:
+        dict: File information formatted like PREV_DATA
+    """
+    with closing(connect_study_state_store(path_to_study_state)) as connection:
+        # CROSS JOIN makes SQLite find each study's newest date with primary key searches 
+        # instead of scanning every recorded date
+        rows = connection.execute("""SELECT study_id, file_count, total_file_size FROM studies CROSS JOIN study_state USING (study_id)
+                                     WHERE date = (SELECT MAX(date) FROM study_state AS earlier 
+                                                   WHERE earlier.study_id = studies.study_id AND earlier.date < ?)""", 
+                                  (date.strftime("%Y-%m-%d"),)).fetchall()
+
+    return {study_id : {"N: File Count" : file_count if file_count is not None else np.nan,
+                        "N: Total File Size (MB)" : total_file_size if total_file_size is not None else np.nan}
+            for study_id, file_count, total_file_size in rows}
 
-        # Change previous "N: File Count" and "N: Total File Size (MB)" to current file's:
-        current_file_df.apply(build_prev_data_dict, axis=1)
+def read_study_state_version(date, path_to_study_state=STUDY_STATE_PATH):
+    """
+    Returns a version of the file information read_study_state() returns for a date, 
+    which changes whenever a date before it is recorded again. It is much cheaper to 
+    read than the file information itself.
 
-        df = current_file_df.copy() if df.empty else pd.concat([current_file_df, df], ignore_index=True)
+    Args:
+        date (datetime.date): The date the file information is from before
 
-    # Reverse rows of df so newest date appears last
-    df = df.iloc[::-1]
+        path_to_study_state (str): path to the study state database
 
-    return df 
+    Returns:
+        int: The version, which is 0 if no date before date was recorded
+    """
+    with closing(connect_study_state_store(path_to_study_state)) as connection:
+        return connection.execute("SELECT COALESCE(MAX(version), 0) FROM study_state_versions WHERE date < ?", 
+                                  (date.strftime("%Y-%m-%d"),)).fetchone()[0]
 
 def get_date_of_file(file=""):
     """
@@ -85,14 +1441,15 @@ def get_date_of_file(file=""):
     
     return date
 
+@timed_stage("pivot")
 def get_problem_detected_df(df):
     """
-    Performs a groupby() operation on the Pandas DataFrame built from CSV files
-    in the data directory and accesses the values from the "Problem Detected" column.
-    It then unstacks the Pandas Series returned by this operation to create a Pandas 
-    DataFrame with dates as columns and study ids as indices. The element associated
-    with each date and study id represents whether a problem occurred with a study's
-    data transfer on a given date. 
+    Returns a Pandas DataFrame with dates as columns and study ids as indices. The 
+    element associated with each date and study id represents whether a problem occurred
+    with a study's data transfer on a given date, encoded with encode_statuses() so the
+    whole DataFrame is a single numpy.uint8 matrix. Study ids and dates are sorted, so
+    a range of dates is a slice of columns. If a study appears more than once on a date,
+    its last status in df is used.
 
     Args:
         df (pandas.DataFrame): The Pandas DataFrame built from CSV files in the data 
@@ -102,8 +1459,138 @@ def get_problem_detected_df(df):
         pandas.DataFrame: Returns a Pandas DataFrame where each element represents whether 
         a problem occurred with a study's data transfer on a given date. 
     """
-    return df.groupby(["Study ID", "Date"])["Problem Detected"].last().unstack()
+    study_codes, study_ids = pd.factorize(df["Study ID"], sort=True)
+    date_codes, dates = pd.factorize(df["Date"], sort=True)
+    statuses = df["Problem Detected"].to_numpy()
+
+    rows = np.flatnonzero((study_codes >= 0) & (date_codes >= 0) & pd.notna(statuses))
+    cells = study_codes[rows] * len(dates) + date_codes[rows]
+    # np.unique finds the first occurrence of each cell, so search the rows backwards
+    _, last_from_end = np.unique(cells[::-1], return_index=True)
+    last_rows = rows[len(rows) - 1 - last_from_end]
+
+    codes = np.zeros((len(study_ids), len(dates)), dtype=np.uint8)
+    codes.flat[study_codes[last_rows] * len(dates) + date_codes[last_rows]] = encode_statuses(statuses[last_rows])
+
+    return pd.DataFrame(codes, index=pd.Index(study_ids, name="Study ID"), columns=pd.Index(dates, name="Date"), copy=False)
+
+def encode_statuses(statuses):
+    """
+    Encodes error statuses as the small integers in STATUS_CODES. Missing and unknown 
+    statuses are encoded as 0.
+
+    Args:
+        statuses (numpy.ndarray): An array of error statuses ('E', 'G', or "NR")
+
+    Returns:
+        numpy.ndarray: An array of numpy.uint8 codes with the same shape as statuses
+    """
+    codes = np.zeros(statuses.shape, dtype=np.uint8)
+    for status, code in STATUS_CODES.items():
+        codes[statuses == status] = code
+
+    return codes
+
+def decode_statuses(codes):
+    """
+    Decodes the small integers returned by encode_statuses() back into error statuses.
+
+    Args:
+        codes (numpy.ndarray): An array of numpy.uint8 codes
+
+    Returns:
+        numpy.ndarray: An array of error statuses with the same shape as codes. Missing 
+        statuses are None.
+    """
+    return STATUS_NAMES[codes]
+
+@timed_stage("metadata")
+def get_study_metadata(df, date):
+    """
+    Returns the "Occurrence", "Last Successful Run Date", "Last Successful Run Time", 
+    "Next Run Date", and "Next Run Time" of each study on a given date. If a study 
+    appears more than once on the date, its last row in df is used.
+
+    Args:
+        df (pandas.DataFrame): The Pandas DataFrame built from CSV files in the data 
+        directory
+
+        date (datetime.date): The date to get metadata for
+
+    Returns:
+        dict: A dictionary mapping each Study ID with data on the given date to a 
+        dictionary with the keys "occurrence", "last_successful_run_date",
+        "last_successful_run_time", "next_run_date", and "next_run_time"
+    """
+    metadata_columns = {"Occurrence" : "occurrence", "Last Successful Run Date" : "last_successful_run_date",
+                        "Last Successful Run Time" : "last_successful_run_time", "Next Run Date" : "next_run_date",
+                        "Next Run Time" : "next_run_time"}
+    date_df = df[df["Date"] == date].drop_duplicates("Study ID", keep="last")
+
+    return {study_id : dict(zip(metadata_columns.values(), study_metadata)) 
+            for study_id, *study_metadata in date_df[["Study ID"] + list(metadata_columns)].astype(object).itertuples(index=False)}
+
+@timed_stage("summarize")
+def get_study_summaries(df, problem_detected_df, date):
+    """
+    Returns a summary of each study in a problem_detected_df as of a given date. Each 
+    summary holds the study's metadata on the date from get_study_metadata(), or None
+    for each field if the study has no data on the date, along with:
+        "errors_past_week" and "errors_past_month": The number of dates with an 'E' 
+        status in the 7 and DAYS_IN_MONTH days ending on the date
+        "current_error_streak": The number of dates with data in a row, ending on the 
+        date, with an 'E' status
+        "longest_error_streak": The most dates with data in a row with an 'E' status
+        "last_error_date": The newest date with an 'E' status, or None
+
+    Args:
+        df (pandas.DataFrame): The Pandas DataFrame built from CSV files in the data 
+        directory
+
+        problem_detected_df (pandas.DataFrame): The problem_detected_df built from df
+
+        date (datetime.date): The date to summarize studies as of
+
+    Returns:
+        dict: A dictionary mapping each Study ID in problem_detected_df to its summary. 
+        Summaries also have the key "uploaded_on_date", which is True if the study has
+        data on the date.
+    """
+    study_metadata = get_study_metadata(df, date)
+    problem_detected_df = problem_detected_df.loc[:, :date]
+    codes = problem_detected_df.to_numpy()
+    if codes.dtype != np.uint8:
+        codes = encode_statuses(codes)
+    is_error = codes == STATUS_CODES['E']
+    num_dates = is_error.shape[1]
+
+    days_before_date = (np.datetime64(date, "D") - np.array(problem_detected_df.columns, dtype="datetime64[D]")).astype(int)
+    errors_past_week = is_error[:, days_before_date < 7].sum(axis=1)
+    errors_past_month = is_error[:, days_before_date < DAYS_IN_MONTH].sum(axis=1)
+
+    # Appending a date without errors lets argmin and argmax handle studies without errors
+    newest_first_is_error = np.concatenate([is_error[:, ::-1], np.zeros((len(is_error), 1), dtype=bool)], axis=1)
+    current_error_streaks = newest_first_is_error.argmin(axis=1)
+    last_error_columns = num_dates - 1 - newest_first_is_error.argmax(axis=1)
+    has_error = is_error.any(axis=1)
+    longest_error_streaks = np.zeros(len(is_error), dtype=int)
+    error_streaks = np.zeros(len(is_error), dtype=int)
+    for date_is_error in is_error.T:
+        error_streaks = (error_streaks + 1) * date_is_error
+        np.maximum(longest_error_streaks, error_streaks, out=longest_error_streaks)
 
+    empty_metadata = {"occurrence" : None, "last_successful_run_date" : None, "last_successful_run_time" : None, 
+                      "next_run_date" : None, "next_run_time" : None}
+    study_summaries = {}
+    for row, study_id in enumerate(problem_detected_df.index):
+        study_summaries[study_id] = dict(study_metadata.get(study_id, empty_metadata), uploaded_on_date=study_id in study_metadata,
+                                         errors_past_week=int(errors_past_week[row]), errors_past_month=int(errors_past_month[row]),
+                                         current_error_streak=int(current_error_streaks[row]), longest_error_streak=int(longest_error_streaks[row]),
+                                         last_error_date=str(problem_detected_df.columns[last_error_columns[row]]) if has_error[row] else None)
+
+    return study_summaries
+
+@timed_stage("slice")
 def get_problem_detected_df_between_dates(problem_detected_df, current_date=datetime.now().date(), num_days_in_past=1):
     """
     Returns a Pandas DataFrame representing whether a problem occurred with a study's
@@ -127,7 +1614,8 @@ def get_problem_detected_df_between_dates(problem_detected_df, current_date=date
     """
     prev_date, current_date = get_day_num_days_in_past(current_date=current_date, num_days_in_past=num_days_in_past)
 
-    return problem_detected_df.T.loc[prev_date:current_date].T
+    # Dates are sorted, so this slices columns without copying the statuses
+    return problem_detected_df.loc[:, prev_date:current_date]
 
 def get_day_num_days_in_past(current_date=datetime.now().date(), num_days_in_past=1):
     """
@@ -154,8 +1642,62 @@ def get_day_num_days_in_past(current_date=datetime.now().date(), num_days_in_pas
 
     return (prev_date, current_date)
 
+# Get JSON for the Status API
+def get_problem_detected_json(problem_detected_df, start_date, end_date, study_ids=None, statuses=None, page=1, page_size=API_PAGE_SIZE):
+    """
+    Returns the statuses of a problem_detected_df between start_date and end_date as a 
+    JSON-serializable dictionary. Statuses are encoded with encode_statuses() and each 
+    study's statuses are joined into a string with a digit per date, so "1121" means 
+    'G', 'G', 'E', 'G'. Studies are sorted by Study ID and split into pages.
+
+    Args:
+        problem_detected_df (pandas.DataFrame): The Pandas DataFrame representing whether
+        a problem occurred with a study's data transfer on a given date.
+
+        start_date (datetime.date): The oldest date
+
+        end_date (datetime.date): The newest date
+
+        study_ids (list of str, optional): Only include these studies. Unknown Study IDs
+        are ignored. Defaults to every study.
+
+        statuses (list of str, optional): Only include studies with at least one of these
+        error statuses between start_date and end_date. Defaults to every study.
+
+        page (int): The page of studies to return, starting from 1. Defaults to 1.
+
+        page_size (int): The number of studies on each page. Defaults to API_PAGE_SIZE.
+
+    Returns:
+        dict: A dictionary with the keys "data_version", "start", "end", "dates", 
+        "statuses" (the status each code decodes to), "studies", "rows", "page", 
+        "page_size", and "total_studies"
+    """
+    window_problem_detected_df = get_problem_detected_df_between_dates(problem_detected_df, current_date=end_date,
+                                                                       num_days_in_past=(end_date - start_date).days + 1)
+    codes = window_problem_detected_df.to_numpy()
+    if codes.dtype != np.uint8:
+        codes = encode_statuses(codes)
+    rows = np.arange(len(window_problem_detected_df.index))
+
+    if study_ids is not None:
+        rows = np.unique(window_problem_detected_df.index.get_indexer(study_ids))
+        rows = rows[rows >= 0]
+    if statuses is not None:
+        status_codes = [STATUS_CODES[status] for status in statuses]
+        rows = rows[np.isin(codes[rows], status_codes).any(axis=1)]
+
+    page_rows = rows[(page - 1) * page_size : page * page_size]
+    # Codes are single digits, so each row can be written as a string of digits
+    digit_rows = (codes[page_rows] + ord('0')).view("S1")
+
+    return {"data_version" : problem_detected_df.attrs.get("data_version"), "start" : str(start_date), "end" : str(end_date),
+            "dates" : [str(date) for date in window_problem_detected_df.columns], "statuses" : STATUS_NAMES.tolist(),
+            "studies" : [str(study_id) for study_id in window_problem_detected_df.index[page_rows]],
+            "rows" : [row.tobytes().decode() for row in digit_rows], "page" : page, "page_size" : page_size, "total_studies" : len(rows)}
+
 # Get HTML for Today's Problems Detected
-def get_html_for_problem_detected_df(problem_detected_df, study_id="", num_days_in_past=1):
+def get_html_for_problem_detected_df(problem_detected_df, study_id="", num_days_in_past=1, current_date=None):
     """
     Returns the HTML associated with a problem_detected_df
 
@@ -164,35 +1706,323 @@ def get_html_for_problem_detected_df(problem_detected_df, study_id="", num_days_
         a problem occurred with a study's data transfer on a given date.
 
         study_id (str): The id of a Study. Defaults to "". Represents including data from all
-        studies in the problem_detected_df.
+        studies in the problem_detected_df. The HTML is empty if the study has no row.
 
         num_days_in_past (int): The number of days that the returned problem_detected_df
         will range into the past.
 
+        current_date (datetime.date, optional): The newest date included in the HTML. 
+        Defaults to the date returned by get_current_date().
+
     Returns:
         str: The HTML associated with the problem_detected_df
     """
+    current_date = current_date if current_date is not None else get_current_date()
+
+    # HTML can only be cached for a problem_detected_df built by get_cached_problem_detected_data()
+    data_version = problem_detected_df.attrs.get("data_version")
+    html_cache_key = (data_version, study_id, num_days_in_past, current_date)
+    if data_version is not None:
+        html = get_cached_html(html_cache_key)
+        if html is not None:
+            return html
 
-    # Use either a date string "YYYY-MM-DD" or datetime.now().date() to build problem_detected_df
-    RUNNING_WITH_DATE_STRING = os.environ.get("RUNNING_WITH_DATE_STRING", "False")
-    if RUNNING_WITH_DATE_STRING == 'True':
-        DATE_STRING = os.getenv("DATE_STRING")
-        new_problem_detected_df = get_problem_detected_df_between_dates(problem_detected_df, current_date=DATE_STRING, num_days_in_past=num_days_in_past)
+    new_problem_detected_df = get_problem_detected_df_between_dates(problem_detected_df, current_date=current_date, num_days_in_past=num_days_in_past)
+    
+    if new_problem_detected_df.empty or (study_id != "" and study_id not in new_problem_detected_df.index):
+        # The dates may come before the study's first CSV file or after its last one
+        table_html = ""
+    elif study_id != "":
+        # Index.get_loc() looks up the study's row in a hash table
+        study_row = new_problem_detected_df.index.get_loc(study_id)
+        new_problem_detected_df = new_problem_detected_df.iloc[[study_row]].rename_axis(index=None)
+        table_html = render_problem_detected_table(new_problem_detected_df)
     else:
-        new_problem_detected_df = get_problem_detected_df_between_dates(problem_detected_df, num_days_in_past=num_days_in_past)
+        # Link each study to its single study page
+        table_html = render_problem_detected_table(new_problem_detected_df, link_study_ids=True)
+
+    if data_version is not None:
+        cache_html(html_cache_key, table_html)
+    return table_html
+
+@timed_stage("render_table")
+def render_problem_detected_table(problem_detected_df, link_study_ids=False):
+    """
+    Returns an HTML table for a problem_detected_df with a row for each study and a 
+    column for each date. Each td HTML element gets the class of its error status ('E',
+    'G', or "NR"), which static/styles.css colors "red", "green", and "gray". Dates 
+    surrounding a missing date get the class "gap-date", which is colored yellow. Cells 
+    are left empty because only their color is displayed. Statuses may be encoded with
+    encode_statuses().
+
+    Args:
+        problem_detected_df (pandas.DataFrame): The Pandas DataFrame representing whether
+        a problem occurred with a study's data transfer on a given date.
+
+        link_study_ids (bool): True if each Study ID should link to its single study page. 
+        Defaults to False.
+
+    Returns:
+        str: The HTML table associated with the problem_detected_df
+    """
+    # A date surrounds a missing date if the displayed date next to it isn't one day away
+    dates = np.array(problem_detected_df.columns, dtype="datetime64[D]")
+    is_next_to_gap = np.abs(np.diff(dates).astype(int)) > 1
+    is_gap_date = np.append(is_next_to_gap, False) | np.insert(is_next_to_gap, 0, False)
+
+    date_header = html.escape(str(problem_detected_df.columns.name)) if problem_detected_df.columns.name is not None else "&nbsp;"
+    lines = ['<table class="problem-detected-table">', '  <thead>', '    <tr>',
+             f'      <th class="index_name level0">{date_header}</th>']
+    lines.extend(f'      <th class="col_heading level0{" gap-date" if gap else ""}">{html.escape(str(date))}</th>' 
+                 for date, gap in zip(problem_detected_df.columns, is_gap_date))
+    lines.append('    </tr>')
+    if problem_detected_df.index.name is not None:
+        lines.extend(['    <tr>', f'      <th class="index_name level0">{html.escape(str(problem_detected_df.index.name))}</th>'])
+        lines.extend('      <th class="blank">&nbsp;</th>' for _ in problem_detected_df.columns)
+        lines.append('    </tr>')
+    lines.extend(['  </thead>', '  <tbody>'])
+
+    statuses_matrix = problem_detected_df.to_numpy()
+    if statuses_matrix.dtype == np.uint8:
+        statuses_matrix = decode_statuses(statuses_matrix)
+
+    for study_id, statuses in zip(problem_detected_df.index, statuses_matrix):
+        escaped_study_id = html.escape(str(study_id))
+        if link_study_ids:
+            escaped_study_id = f'<a href="/displaySingle/{html.escape(quote(str(study_id), safe=""))}">{escaped_study_id}</a>'
+        lines.extend(['    <tr>', f'      <th class="row_heading level0">{escaped_study_id}</th>'])
+        # Statuses other than 'E', 'G', and "NR", such as missing values, are colored gray
+        lines.extend(f'      <td class="data {status if status in STATUS_CLASSES else "NR"}"></td>' for status in statuses)
+        lines.append('    </tr>')
+    lines.extend(['  </tbody>', '</table>'])
+
+    return "\n".join(lines)
+
+def get_cached_html(html_cache_key):
+    """
+    Returns HTML stored in HTML_CACHE and counts the lookup as a hit or a miss. Entries 
+    older than HTML_CACHE_TTL_SECONDS are treated as missing.
+
+    Args:
+        html_cache_key (tuple): The data version, study id, number of days, and current 
+        date that the HTML was rendered for
+
+    Returns:
+        str: The cached HTML, or None if there is no cached HTML for html_cache_key
+    """
+    with HTML_CACHE_LOCK:
+        cached_html = HTML_CACHE.get(html_cache_key)
+        if cached_html is None or time.monotonic() - cached_html[0] > HTML_CACHE_TTL_SECONDS:
+            HTML_CACHE_STATS["misses"] += 1
+            return None
+        
+        HTML_CACHE.move_to_end(html_cache_key)
+        HTML_CACHE_STATS["hits"] += 1
+        return cached_html[1]
+
+def cache_html(html_cache_key, html):
+    """
+    Stores HTML in HTML_CACHE, evicting the least recently used entries until the 
+    cached HTML takes up at most HTML_CACHE_MAX_BYTES.
+
+    Args:
+        html_cache_key (tuple): The data version, study id, number of days, and current 
+        date that the HTML was rendered for
+
+        html (str): The rendered HTML
+    """
+    with HTML_CACHE_LOCK:
+        replaced_html = HTML_CACHE.pop(html_cache_key, None)
+        if replaced_html is not None:
+            HTML_CACHE_STATS["bytes"] -= len(replaced_html[1])
+
+        HTML_CACHE[html_cache_key] = (time.monotonic(), html)
+        HTML_CACHE_STATS["bytes"] += len(html)
+        while HTML_CACHE_STATS["bytes"] > HTML_CACHE_MAX_BYTES and HTML_CACHE:
+            _, (_, evicted_html) = HTML_CACHE.popitem(last=False)
+            HTML_CACHE_STATS["bytes"] -= len(evicted_html)
+            HTML_CACHE_STATS["evictions"] += 1
+
+def get_html_cache_stats():
+    """
+    Returns the number of hits, misses, and evictions of HTML_CACHE along with the 
+    number of entries and bytes it holds.
+
+    Returns:
+        dict: The statistics of HTML_CACHE
+    """
+    with HTML_CACHE_LOCK:
+        return dict(HTML_CACHE_STATS, entries=len(HTML_CACHE))
+
+def clear_html_cache():
+    """
+    Empties HTML_CACHE while keeping its hit, miss, and eviction counts. HTML_CACHE_LOCK 
+    must be held.
+    """
+    HTML_CACHE.clear()
+    HTML_CACHE_STATS["bytes"] = 0
+
+def register_process_cache(cache, lock, clear=None):
+    """
+    Registers an in-process cache so that clear_process_caches() empties it. Every 
+    module-level cache that holds data read from CSV files or built from it should be 
+    registered where it is defined.
+
+    Args:
+        cache (dict): The cache
+
+        lock (threading.Lock): The lock guarding cache
+
+        clear (callable, optional): Empties cache while lock is held. Defaults to None, 
+        meaning cache.clear().
+
+    Returns:
+        dict: cache
+    """
+    PROCESS_CACHES.append((cache, lock, clear if clear is not None else cache.clear))
+    return cache
+
+def clear_process_caches():
+    """
+    Empties every cache registered with register_process_cache(), so the next request
+    reads and renders everything again, the way it would in a new process. Loads and 
+    refreshes that are running are left alone.
+    """
+    for _, lock, clear in PROCESS_CACHES:
+        with lock:
+            clear()
+
+register_process_cache(FILE_INDEX, FILE_INDEX_LOCK)
+register_process_cache(DATASET_CACHE, DATASET_CACHE_LOCK)
+register_process_cache(LAST_SOURCE_DATA, SOURCE_LOADING_LOCK)
+register_process_cache(MERGED_DATA_CACHE, SOURCE_LOADING_LOCK)
+register_process_cache(HTML_CACHE, HTML_CACHE_LOCK, clear=clear_html_cache)
+
+def get_current_date():
+    """
+    Returns the date that is treated as today. Uses the date string DATE_STRING formatted 
+    as YYYY-MM-DD if RUNNING_WITH_DATE_STRING is 'True', and datetime.now().date() otherwise.
 
+    Returns:
+        datetime.date: The current date
+    """
+    if os.getenv("RUNNING_WITH_DATE_STRING", "False") == 'True':
+        _, current_date = get_day_num_days_in_past(current_date=os.getenv("DATE_STRING", ""))
+        return current_date
+    
+    return datetime.now().date()
+
+def get_current_month_date_range(current_date=None):
+    """
+    Returns the date range displayed by "/" and "/today", which covers the DAYS_IN_MONTH
+    days ending on the current date.
+
+    Args:
+        current_date (datetime.date, optional): The newest date. Defaults to 
+        get_current_date().
+
+    Returns:
+        (start_date, end_date): Returns a tuple of the oldest and newest dates
+    """
+    current_date = current_date if current_date is not None else get_current_date()
+    return (current_date - timedelta(DAYS_IN_MONTH - 1), current_date)
+
+@timed_stage("classify")
+def get_problem_detected_statuses(df, prev_data=None):
+    """
+    Returns the error status of every row in a DataFrame built from CSV files. This is a 
+    vectorized version of format_problem_detected_column() and build_prev_data_dict()
+    that classifies all dates at once instead of one row at a time. Rows that would 
+    update PREV_DATA are sorted by "Study ID" and "Date", and each row is compared
+    against the last of these updates for its study from an earlier date.
+
+    Args:
+        df (pandas.DataFrame): DataFrame with the columns in COLUMNS_FROM_CSV_FILE and
+        "Date". Rows sharing a date must be in the order they appear in their CSV file.
+
+        prev_data (dict, optional): File information from before the oldest date in df,
+        formatted like PREV_DATA. Defaults to None, representing no previous data.
+
+    Returns:
+        (pandas.Series, dict): Returns a tuple of the error statuses aligned with df's 
+        index and the file information of each study after its newest date, formatted
+        like PREV_DATA.
+    """
+    prev_data = prev_data if prev_data is not None else {}
+    file_information_columns = ["N: File Count", "N: Total File Size (MB)"]
+    if df.empty:
+        return (pd.Series(index=df.index, dtype=object), dict(prev_data))
+
+    # A DataFrame only holds a few distinct dates, so format each of them once
+    date_codes, unique_dates = pd.factorize(df["Date"])
+    date_strings = np.array([date.strftime("%Y-%m-%d") for date in unique_dates], dtype=object)[date_codes]
+    # Rank dates so prev_data gets rank 0 and the oldest date in df gets rank 1
+    date_ranks = np.argsort(np.argsort(np.array(unique_dates, dtype="datetime64[D]"), kind="stable"))[date_codes] + 1
+    problem_detected_is_null = df["Problem Detected"].isnull().to_numpy()
+
+    # Weekly studies that didn't run on a given date don't update PREV_DATA
+    is_weekly_not_run = get_is_weekly_not_run(df, date_strings)
     
-    if new_problem_detected_df.empty:
-        return ""
+    # Updates to each study's file information in the order PREV_DATA would see them
+    study_codes, unique_study_ids = pd.factorize(pd.concat([pd.Series(list(prev_data), dtype=object), df["Study ID"]], ignore_index=True))
+    prev_data_study_codes, study_codes = study_codes[:len(prev_data)], study_codes[len(prev_data):]
+    update_keys = np.concatenate((prev_data_study_codes * (len(unique_dates) + 1),
+                                  study_codes[~is_weekly_not_run] * (len(unique_dates) + 1) + date_ranks[~is_weekly_not_run]))
+    update_values = {}
+    for column in file_information_columns:
+        update_values[column] = df[column].to_numpy()[~is_weekly_not_run]
+        if prev_data:
+            prev_data_values = np.array([study_prev_data[column] for study_prev_data in prev_data.values()], dtype=object)
+            update_values[column] = np.concatenate((prev_data_values, update_values[column]))
+
+    # Rows from the same date update PREV_DATA in order, so only the last one is visible on later dates
+    update_order = np.argsort(update_keys, kind="stable")
+    update_keys = update_keys[update_order]
+    is_last_update_of_date = np.append(update_keys[1:] != update_keys[:-1], True)[:len(update_keys)]
+    update_order, update_keys = update_order[is_last_update_of_date], update_keys[is_last_update_of_date]
+
+    # Find each row's previous update: the last update for its study from an earlier date
+    row_keys = study_codes * (len(unique_dates) + 1) + date_ranks
+    prev_update_positions = np.searchsorted(update_keys, row_keys, side="left") - 1
+    has_prev_update = prev_update_positions >= 0
+    has_prev_update[has_prev_update] = (update_keys[prev_update_positions[has_prev_update]] // (len(unique_dates) + 1) 
+                                        == study_codes[has_prev_update])
+
+    has_invalid_files_upload = np.zeros(len(df), dtype=bool)
+    for column in file_information_columns:
+        prev_values = update_values[column][update_order[prev_update_positions[has_prev_update]]]
+        # Comparisons with missing values are False, matching is_invalid_files_upload()
+        with np.errstate(invalid="ignore"):
+            has_invalid_files_upload[has_prev_update] |= (df[column].to_numpy()[has_prev_update] < prev_values).astype(bool)
     
-    if study_id != "":
-        new_problem_detected_df = pd.DataFrame(new_problem_detected_df.loc[study_id]).T
+    statuses = np.where(is_weekly_not_run & problem_detected_is_null, "NR",
+                        np.where(~problem_detected_is_null | has_invalid_files_upload, 'E', 'G'))
     
-    # Color td HTML elements according to their error status
-    styled_problem_detected_df = new_problem_detected_df.style.apply(lambda x : x.map(highlight_errors))
-    # Color the dates surrounding a missing date yellow
-    styled_problem_detected_df.apply_index(highlight_dates, axis=1)
-    return styled_problem_detected_df.to_html()
+    # The last update of each study becomes its new PREV_DATA entry
+    is_last_update_of_study = np.append(update_keys[1:] // (len(unique_dates) + 1) != update_keys[:-1] // (len(unique_dates) + 1), True)[:len(update_keys)]
+    new_prev_data = {}
+    for update_key, update_position in zip(update_keys[is_last_update_of_study], update_order[is_last_update_of_study]):
+        new_prev_data[unique_study_ids[update_key // (len(unique_dates) + 1)]] = {column : update_values[column][update_position] 
+                                                                                for column in file_information_columns}
+
+    return (pd.Series(statuses, index=df.index, dtype=object), new_prev_data)
+
+def get_is_weekly_not_run(df, date_strings):
+    """
+    Returns whether each row of a DataFrame built from CSV files belongs to a weekly
+    study that didn't run on the row's date.
+
+    Args:
+        df (pandas.DataFrame): DataFrame with the columns in COLUMNS_FROM_CSV_FILE
+
+        date_strings (numpy.ndarray or str): The date of each row, or of every row, 
+        formatted as YYYY-MM-DD
+
+    Returns:
+        numpy.ndarray: A boolean array aligned with df's rows
+    """
+    return ((df["Occurrence"] == "Weekly").to_numpy() & 
+            (df["Last Successful Run Date"].to_numpy() != date_strings))
 
 def build_prev_data_dict(row):
     """
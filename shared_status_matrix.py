@@ -0,0 +1,134 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from problem_detected_data_visualization import *
+
+# Shared Status Matrix:
+SHARED_MATRIX_DIRECTORY = os.getenv("SHARED_MATRIX_DIRECTORY", os.path.join(SNAPSHOT_DIRECTORY, "shared_matrix"))
+CURRENT_VERSION_FILE = "CURRENT"
+# Older versions may still be mapped by workers that haven't reloaded yet
+VERSIONS_TO_KEEP = 2
+
+def write_shared_status_matrix(problem_detected_df, study_summaries, window, directory=SHARED_MATRIX_DIRECTORY):
+    """
+    Writes a problem_detected_df and the summaries of its studies so that other processes
+    can memory-map them with load_shared_status_matrix(). Statuses are stored as a
+    numpy.uint8 matrix with a row for each study and a column for each date, and the
+    metadata is stored as JSON. Each version is written to its own files before the
+    CURRENT file is atomically replaced to point at it.
+
+    Args:
+        problem_detected_df (pandas.DataFrame): The Pandas DataFrame representing whether
+        a problem occurred with a study's data transfer on a given date.
+
+        study_summaries (dict): The summary of each study returned by get_study_summaries()
+
+        window (tuple of datetime.date): The oldest and newest dates the data was built from
+
+        directory (str): path to the directory that shared status matrices are written to
+
+    Returns:
+        str: The version of the written status matrix
+    """
+    os.makedirs(directory, exist_ok=True)
+    data_version = problem_detected_df.attrs.get("data_version")
+    version = f"{window[0]:%Y%m%d}-{window[1]:%Y%m%d}-{data_version}"
+
+    statuses = problem_detected_df.to_numpy()
+    codes = statuses if statuses.dtype == np.uint8 else encode_statuses(statuses)
+    metadata = {"window" : [str(date) for date in window], "data_version" : data_version,
+                "data_modified" : problem_detected_df.attrs.get("data_modified"),
+                "study_ids" : [str(study_id) for study_id in problem_detected_df.index],
+                "dates" : [str(date) for date in problem_detected_df.columns], "study_summaries" : study_summaries}
+
+    write_file_atomically(os.path.join(directory, version + ".npy"), lambda file: np.save(file, np.ascontiguousarray(codes)), mode="wb")
+    write_file_atomically(os.path.join(directory, version + ".json"), lambda file: json.dump(metadata, file), mode="w")
+    write_file_atomically(os.path.join(directory, CURRENT_VERSION_FILE), lambda file: file.write(version), mode="w")
+
+    remove_old_versions(directory, version)
+    return version
+
+def write_file_atomically(file_path, write, mode="w"):
+    """
+    Writes a file by writing to a temporary file and renaming it, so readers never see a
+    partially written file.
+
+    Args:
+        file_path (str): path to the file
+
+        write (callable): Function that writes the file's contents to an open file object
+
+        mode (str): The mode the temporary file is opened with. Defaults to "w".
+    """
+    temporary_file_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temporary_file_path, mode) as file:
+        write(file)
+    os.replace(temporary_file_path, file_path)
+
+def remove_old_versions(directory, current_version):
+    """
+    Removes all but the VERSIONS_TO_KEEP most recently written versions of the shared
+    status matrix. Workers that still map a removed version keep working because the
+    operating system keeps the file's data until it is unmapped.
+
+    Args:
+        directory (str): path to the directory that shared status matrices are written to
+
+        current_version (str): The version that was just written
+    """
+    version_paths = [os.path.join(directory, file) for file in os.listdir(directory) if file.endswith(".npy")]
+    version_paths.sort(key=lambda version_path: os.stat(version_path).st_mtime_ns, reverse=True)
+    for version_path in version_paths[VERSIONS_TO_KEEP:]:
+        if os.path.basename(version_path) == current_version + ".npy":
+            continue
+        for extension in (".npy", ".json"):
+            try:
+                os.remove(os.path.splitext(version_path)[0] + extension)
+            except FileNotFoundError:
+                pass
+
+def get_current_shared_version(directory=SHARED_MATRIX_DIRECTORY):
+    """
+    Returns the version of the most recently written shared status matrix.
+
+    Args:
+        directory (str): path to the directory that shared status matrices are written to
+
+    Returns:
+        str: The current version, or None if no status matrix has been written
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_VERSION_FILE)) as current_version_file:
+            return current_version_file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def load_shared_status_matrix(version, directory=SHARED_MATRIX_DIRECTORY):
+    """
+    Memory-maps a shared status matrix read-only. The returned problem_detected_df
+    wraps the mapped matrix without copying it, so every process that loads the same
+    version shares one copy of the statuses.
+
+    Args:
+        version (str): The version returned by get_current_shared_version()
+
+        directory (str): path to the directory that shared status matrices are written to
+
+    Returns:
+        dict: A dictionary with the keys "window", "data_version", "problem_detected_df"
+        holding numpy.uint8 encoded statuses, "study_summaries", and "version"
+    """
+    with open(os.path.join(directory, version + ".json")) as metadata_file:
+        metadata = json.load(metadata_file)
+    codes = np.load(os.path.join(directory, version + ".npy"), mmap_mode="r")
+
+    dates = pd.Index([datetime.strptime(date, "%Y-%m-%d").date() for date in metadata["dates"]], dtype=object, name="Date")
+    problem_detected_df = pd.DataFrame(codes, index=pd.Index(metadata["study_ids"], name="Study ID"), columns=dates, copy=False)
+    problem_detected_df.attrs["data_version"] = metadata["data_version"]
+    problem_detected_df.attrs["data_modified"] = metadata["data_modified"]
+
+    window = tuple(datetime.strptime(date, "%Y-%m-%d").date() for date in metadata["window"])
+    return {"window" : window, "data_version" : metadata["data_version"], "problem_detected_df" : problem_detected_df,
+            "study_summaries" : metadata["study_summaries"], "version" : version}
@@ -0,0 +1,106 @@
+import app as app_module
+from app import app, READINESS
+from problem_detected_data_visualization import get_html_cache_stats
+
+def test_status_api_returns_304_for_matching_etag(monkeypatch):
+    monkeypatch.setenv("RUNNING_WITH_DATE_STRING", "True")
+    monkeypatch.setenv("DATE_STRING", "2024-07-07")
+    client = app.test_client()
+
+    response = client.get("/api/status?status=E&page_size=10")
+    assert response.status_code == 200
+    assert len(response.json["studies"]) == 10
+
+    cached_response = client.get("/api/status?status=E&page_size=10", headers={"If-None-Match" : response.headers["ETag"]})
+    assert cached_response.status_code == 304
+    assert cached_response.data == b""
+
+    other_page_response = client.get("/api/status?status=E&page_size=10&page=2", headers={"If-None-Match" : response.headers["ETag"]})
+    assert other_page_response.status_code == 200
+
+def test_status_api_rejects_unknown_statuses():
+    assert app.test_client().get("/api/status?status=X").status_code == 400
+
+def test_date_ranges_longer_than_max_range_days_are_rejected(monkeypatch):
+    monkeypatch.setattr(app_module, "MAX_RANGE_DAYS", 31)
+    client = app.test_client()
+
+    assert client.get("/api/status?start=2024-06-01&end=2024-07-01").status_code == 200
+    for url in ["/", "/api/status", "/displaySingle/EAY191-N4"]:
+        assert client.get(url + "?start=2024-06-01&end=2024-07-02").status_code == 400
+
+def test_pages_return_304_until_data_changes(monkeypatch):
+    monkeypatch.setenv("RUNNING_WITH_DATE_STRING", "True")
+    monkeypatch.setenv("DATE_STRING", "2024-07-07")
+    client = app.test_client()
+
+    for url in ["/", "/today", "/displaySingle/EAY191-N4"]:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == "public, max-age=60"
+
+        assert client.get(url, headers={"If-None-Match" : response.headers["ETag"]}).status_code == 304
+        assert client.get(url, headers={"If-Modified-Since" : response.headers["Last-Modified"]}).status_code == 304
+        assert client.get(url, headers={"If-None-Match" : '"outdated"'}).status_code == 200
+
+    # A different as-of date changes the ETag even when the CSV files don't change
+    response = client.get("/today")
+    monkeypatch.setenv("DATE_STRING", "2024-07-08")
+    assert client.get("/today", headers={"If-None-Match" : response.headers["ETag"]}).status_code == 200
+
+def test_if_modified_since_is_stale_once_data_version_changes(monkeypatch):
+    monkeypatch.setenv("RUNNING_WITH_DATE_STRING", "True")
+    monkeypatch.setenv("DATE_STRING", "2024-07-07")
+    get_serving_problem_detected_data = app_module.get_serving_problem_detected_data
+    data_version = {"current" : "before"}
+    def versioned_get_serving_problem_detected_data(*args, **kwargs):
+        problem_detected_df, study_summaries = get_serving_problem_detected_data(*args, **kwargs)
+        # Same CSV files and modification times, but different data, such as after a file is deleted
+        problem_detected_df = problem_detected_df.copy(deep=False)
+        problem_detected_df.attrs["data_version"] = data_version["current"]
+        return (problem_detected_df, study_summaries)
+    monkeypatch.setattr(app_module, "get_serving_problem_detected_data", versioned_get_serving_problem_detected_data)
+    client = app.test_client()
+
+    response = client.get("/")
+    assert client.get("/", headers={"If-Modified-Since" : response.headers["Last-Modified"]}).status_code == 304
+    data_version["current"] = "after"
+    assert client.get("/", headers={"If-Modified-Since" : response.headers["Last-Modified"]}).status_code == 200
+
+def test_single_study_page_shows_summary(monkeypatch):
+    monkeypatch.setenv("RUNNING_WITH_DATE_STRING", "True")
+    monkeypatch.setenv("DATE_STRING", "2024-07-07")
+    page = app.test_client().get("/displaySingle/NRG-BN001").data.decode()
+
+    assert "Runs: Daily" in page
+    assert "Errors in Past Month: " in page
+    assert "Last Error Date: " in page
+
+def test_single_study_page_without_data_in_range_is_empty():
+    response = app.test_client().get("/displaySingle/EAY191-N4?end=2021-10-20")
+    assert response.status_code == 200
+    assert b"NO DATA UPLOADED TODAY" in response.data
+    assert b"<table" not in response.data
+
+def test_ready_responds_with_503_until_warm_up_succeeds(monkeypatch):
+    monkeypatch.setenv("RUNNING_WITH_DATE_STRING", "True")
+    monkeypatch.setenv("DATE_STRING", "2024-07-07")
+    monkeypatch.setitem(READINESS, "ready", False)
+    client = app.test_client()
+
+    get_serving_problem_detected_data = app_module.get_serving_problem_detected_data
+    def missing_data(**kwargs):
+        raise FileNotFoundError("data")
+    monkeypatch.setattr(app_module, "get_serving_problem_detected_data", missing_data)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert "FileNotFoundError" in response.json["error"]
+
+    # Warming up is retried, and afterwards the month's table is already rendered
+    monkeypatch.setattr(app_module, "get_serving_problem_detected_data", get_serving_problem_detected_data)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json["error"] is None
+    html_cache_hits = get_html_cache_stats()["hits"]
+    assert client.get("/").status_code == 200
+    assert get_html_cache_stats()["hits"] == html_cache_hits + 1
@@ -0,0 +1,41 @@
+import os
+import sys
+import asyncio
+import subprocess
+import pytest
+
+def call_asgi_app(asgi_app, path):
+    scope = {"type" : "http", "asgi" : {"version" : "3.0"}, "http_version" : "1.1", "method" : "GET", "scheme" : "http",
+             "path" : path, "raw_path" : path.encode(), "query_string" : b"", "root_path" : "", "headers" : [],
+             "client" : ("127.0.0.1", 50000), "server" : ("127.0.0.1", 8000)}
+    messages = []
+    async def receive():
+        return {"type" : "http.request", "body" : b"", "more_body" : False}
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    return messages
+
+# asgi.py configures the app when it is first imported, so it is imported in a new 
+# process the way uvicorn would import it
+ASGI_SMOKE_TEST = """
+from uvicorn.importer import import_from_string
+from test_asgi import call_asgi_app
+
+asgi_app = import_from_string("asgi:asgi_app")
+import ingestion_worker
+assert ingestion_worker.STALE_WHILE_REVALIDATE
+messages = call_asgi_app(asgi_app, "/ready")
+assert messages[0]["type"] == "http.response.start"
+assert messages[0]["status"] == 200
+assert b"ready" in b"".join(message.get("body", b"") for message in messages[1:])
+"""
+
+def test_uvicorn_serves_asgi_app_with_stale_while_revalidate():
+    pytest.importorskip("asgiref")
+    pytest.importorskip("uvicorn")
+    environment = {name : value for name, value in os.environ.items() if name != "STALE_WHILE_REVALIDATE"}
+    result = subprocess.run([sys.executable, "-c", ASGI_SMOKE_TEST], cwd=os.path.dirname(os.path.abspath(__file__)), 
+                            env=environment, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,59 @@
+import socket
+from datetime import datetime
+from benchmark import *
+from problem_detected_data_visualization import build_df_from_csv_files, get_problem_detected_df, get_date_of_file
+
+def test_generate_synthetic_data_matches_csv_file_format(tmp_path):
+    data_directory = str(tmp_path / "data")
+    csv_files = generate_synthetic_data(data_directory, num_studies=50, num_days=14)
+    assert len(csv_files) == 14
+    assert get_date_of_file(csv_files[-1]) == BENCHMARK_END_DATE
+
+    df = build_df_from_csv_files(path_to_csv_directory=data_directory, start_date=datetime(2024, 1, 1).date(), end_date=BENCHMARK_END_DATE)
+    problem_detected_df = get_problem_detected_df(df)
+    assert problem_detected_df.shape == (50, 14)
+    assert set(df["Problem Detected"]) <= {'E', 'G', "NR"}
+    assert "NR" in set(df["Problem Detected"])
+
+def test_run_benchmarks_reports_each_benchmark(tmp_path):
+    data_directory = str(tmp_path / "data")
+    generate_synthetic_data(data_directory, num_studies=20, num_days=10)
+    results = run_benchmarks(data_directory, repeat=1, include_requests=False)
+
+    assert "get_problem_detected_df[all]" in [result["name"] for result in results]
+    assert all(result["repeat"] == 1 and result["min_ms"] >= 0 for result in results)
+
+def test_compare_status_matrices_reports_memory_and_slices():
+    df = build_df_from_csv_files(path_to_csv_directory="data", start_date=datetime(2024, 6, 8).date(), end_date=datetime(2024, 7, 7).date())
+    results = compare_status_matrices(df, datetime(2024, 7, 7).date(), repeat=1)
+
+    assert len(results) == 6
+    memory_bytes = {result["name"].split("[")[1].split(",")[0] : result["memory_bytes"] for result in results}
+    assert 0 < memory_bytes["encoded"] < memory_bytes["unstacked"]
+
+def test_compare_table_renderers_reports_output_size():
+    df = build_df_from_csv_files(path_to_csv_directory="test_data", start_date=datetime(2024, 1, 1).date(), end_date=datetime(2024, 5, 10).date())
+    results = compare_table_renderers(get_problem_detected_df(df), repeat=1)
+
+    assert [result["name"] for result in results] == ["render_problem_detected_table[all studies, 30]", 
+                                                      "render_problem_detected_table_with_styler[all studies, 30]"]
+    # The Styler writes a CSS rule for every cell
+    assert results[0]["output_bytes"] < results[1]["output_bytes"]
+
+def test_compare_benchmark_results_finds_regressions():
+    baseline_results = [{"name" : "fast", "median_ms" : 10.0}, {"name" : "slow", "median_ms" : 10.0}]
+    results = [{"name" : "fast", "median_ms" : 11.0}, {"name" : "slow", "median_ms" : 20.0}, {"name" : "new", "median_ms" : 5.0}]
+    regressions = compare_benchmark_results(baseline_results, results, threshold=1.25)
+
+    assert [regression["name"] for regression in regressions] == ["slow"]
+    assert regressions[0]["ratio"] == 2.0
+
+def test_get_free_port_can_be_bound():
+    port = get_free_port()
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as test_socket:
+        test_socket.bind(("127.0.0.1", port))
+
+def test_measure_cold_start_waits_for_ready():
+    cold_start = measure_cold_start("test_data", warm_up_at_boot=True)
+    assert cold_start["ready_ms"] > 0
+    assert cold_start["first_byte_ms"] > 0
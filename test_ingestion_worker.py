@@ -0,0 +1,136 @@
+import os
+import time
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import ingestion_worker
+from ingestion_worker import *
+
+DATA_DIRECTORY_DATES = ["20211015", "20211016", "20211017"]
+
+def copy_data_files(tmp_path, dates):
+    data_directory = tmp_path / "data"
+    data_directory.mkdir(exist_ok=True)
+    for date in dates:
+        shutil.copy(os.path.join(DATA_DIRECTORY, f"NRG_N_TODAY_COMP_{date}.csv"), data_directory)
+    return str(data_directory)
+
+def test_refresh_serving_state_shares_precomputed_data(tmp_path, monkeypatch):
+    monkeypatch.setenv("RUNNING_WITH_DATE_STRING", "True")
+    monkeypatch.setenv("DATE_STRING", "2021-10-17")
+    monkeypatch.setattr(ingestion_worker, "PARQUET_AVAILABLE", False)
+    monkeypatch.setattr(ingestion_worker, "SERVING_STATE", {})
+    monkeypatch.setattr(ingestion_worker, "INGESTION_WORKER", {"thread" : None, "stop_event" : None, "lock_file" : None})
+    data_directory = copy_data_files(tmp_path, DATA_DIRECTORY_DATES)
+    shared_matrix_directory = str(tmp_path / "shared_matrix")
+
+    refresh_serving_state(data_directory, shared_matrix_directory)
+    start_date, end_date = ingestion_worker.SERVING_STATE["window"]
+    problem_detected_df, study_summaries = get_serving_problem_detected_data(data_directory, start_date=start_date, end_date=end_date)
+    df, expected_problem_detected_df = get_cached_problem_detected_data(data_directory, start_date=start_date, end_date=end_date)
+    assert list(problem_detected_df.columns) == [get_date_of_file(f"NRG_N_TODAY_COMP_{date}.csv") for date in DATA_DIRECTORY_DATES]
+    assert (problem_detected_df.to_numpy() == expected_problem_detected_df.to_numpy()).all()
+    assert study_summaries == get_study_summaries(df, expected_problem_detected_df, end_date)
+
+    # Another process maps the shared status matrix instead of reading CSV files
+    leader_state = ingestion_worker.SERVING_STATE
+    monkeypatch.setattr(ingestion_worker, "SERVING_STATE", {})
+    load_serving_state(data_directory, shared_matrix_directory)
+    follower_matrix = ingestion_worker.SERVING_STATE["problem_detected_df"].to_numpy()
+    assert ingestion_worker.SERVING_STATE["data_version"] == leader_state["data_version"]
+    while not isinstance(follower_matrix, np.memmap):
+        follower_matrix = follower_matrix.base
+    assert not follower_matrix.flags.writeable
+    assert ingestion_worker.SERVING_STATE["problem_detected_df"].equals(leader_state["problem_detected_df"])
+
+    if ingestion_worker.INGESTION_WORKER["lock_file"] is not None:
+        ingestion_worker.INGESTION_WORKER["lock_file"].close()
+
+def test_load_serving_state_reloads_when_version_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_worker, "SERVING_STATE", {})
+    df, problem_detected_df = get_cached_problem_detected_data("test_data")
+    window = (df["Date"].min(), df["Date"].max())
+    shared_matrix_directory = str(tmp_path / "shared_matrix")
+
+    write_shared_status_matrix(problem_detected_df, get_study_summaries(df, problem_detected_df, window[1]), window, shared_matrix_directory)
+    load_serving_state("test_data", shared_matrix_directory)
+    first_state = ingestion_worker.SERVING_STATE
+    load_serving_state("test_data", shared_matrix_directory)
+    assert ingestion_worker.SERVING_STATE is first_state
+
+    changed_problem_detected_df = problem_detected_df.copy()
+    changed_problem_detected_df.attrs["data_version"] = "changed"
+    version = write_shared_status_matrix(changed_problem_detected_df, {}, window, shared_matrix_directory)
+    load_serving_state("test_data", shared_matrix_directory)
+    assert ingestion_worker.SERVING_STATE["version"] == version
+    assert ingestion_worker.SERVING_STATE["study_summaries"] == {}
+
+def test_ingestion_lock_is_held_by_one_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_worker, "INGESTION_WORKER", {"thread" : None, "stop_event" : None, "lock_file" : None})
+    shared_matrix_directory = str(tmp_path / "shared_matrix")
+    assert acquire_ingestion_lock(shared_matrix_directory)
+
+    # A second lock on the same file behaves like another gunicorn worker
+    other_lock_file = open(os.path.join(shared_matrix_directory, "ingestion.lock"), "a")
+    try:
+        fcntl.flock(other_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        acquired_other_lock = True
+    except OSError:
+        acquired_other_lock = False
+    other_lock_file.close()
+    ingestion_worker.INGESTION_WORKER["lock_file"].close()
+
+    assert not acquired_other_lock
+
+def test_revalidated_data_is_refreshed_once_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_worker, "LAST_GOOD_DATA", OrderedDict())
+    monkeypatch.setattr(ingestion_worker, "REFRESHES", {})
+    data_directory = copy_data_files(tmp_path, DATA_DIRECTORY_DATES[:2])
+    start_date, end_date = (get_date_of_file(f"NRG_N_TODAY_COMP_{date}.csv") for date in (DATA_DIRECTORY_DATES[0], DATA_DIRECTORY_DATES[-1]))
+
+    builds = []
+    build_released = threading.Event()
+    build = get_problem_detected_data_with_summaries
+    def slow_build(*args):
+        builds.append(args)
+        build_released.wait(10)
+        return build(*args)
+    monkeypatch.setattr(ingestion_worker, "get_problem_detected_data_with_summaries", slow_build)
+
+    # Concurrent requests for dates that were never built wait for a single refresh
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        requests = [executor.submit(get_revalidated_problem_detected_data, data_directory, start_date, end_date) for _ in range(8)]
+        time.sleep(0.2)
+        build_released.set()
+        results = [request.result() for request in requests]
+    assert len(builds) == 1
+    assert all(result is results[0] for result in results)
+    assert len(results[0][0].columns) == 2
+
+    # Once a new CSV file lands, requests get the last good data until the refresh finishes
+    build_released.clear()
+    copy_data_files(tmp_path, DATA_DIRECTORY_DATES[2:])
+    os.utime(data_directory, ns=(0, 0))
+    for _ in range(8):
+        assert get_revalidated_problem_detected_data(data_directory, start_date, end_date) is results[0]
+    assert list(ingestion_worker.REFRESHES) == [(data_directory, start_date, end_date)]
+
+    refresh = ingestion_worker.REFRESHES[(data_directory, start_date, end_date)]
+    build_released.set()
+    refresh.result()
+    assert len(get_revalidated_problem_detected_data(data_directory, start_date, end_date)[0].columns) == 3
+    assert len(builds) == 2
+
+def test_clear_process_caches_empties_every_cache(tmp_path, monkeypatch):
+    data_directory = copy_data_files(tmp_path, DATA_DIRECTORY_DATES)
+    monkeypatch.setattr(ingestion_worker, "STALE_WHILE_REVALIDATE", True)
+    problem_detected_df, _ = get_serving_problem_detected_data(data_directory)
+    get_html_for_problem_detected_df(problem_detected_df, num_days_in_past=3, current_date=problem_detected_df.columns[-1])
+    assert DATASET_CACHE and FILE_INDEX and STUDY_SUMMARY_CACHE and LAST_GOOD_DATA and HTML_CACHE
+
+    clear_process_caches()
+    assert all(len(cache) == 0 for cache, _, _ in PROCESS_CACHES)
+    assert {id(cache) for cache, _, _ in PROCESS_CACHES} >= {id(cache) for cache in (DATASET_CACHE, FILE_INDEX, HTML_CACHE, LAST_SOURCE_DATA, 
+                                                                                   MERGED_DATA_CACHE, STUDY_SUMMARY_CACHE, LAST_GOOD_DATA)}
+    assert get_html_cache_stats()["bytes"] == 0
@@ -1,4 +1,11 @@
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
 from datetime import datetime
+import problem_detected_data_visualization
 from problem_detected_data_visualization import *
 
 TEST_DATA_DIRECTORY = "test_data"
@@ -109,3 +116,444 @@ def test_prev_data_updates_correctly():
     # Test correct file size
     row = test_df[test_df["Study ID"] == study_id].reset_index()
     assert PREV_DATA[study_id][column] == row[column].iloc[0]
+
+def test_build_df_from_csv_files_leaves_prev_data_alone(monkeypatch):
+    monkeypatch.setattr(problem_detected_data_visualization, "PREV_DATA", {})
+    build_df_from_csv_files(path_to_csv_directory=TEST_DATA_DIRECTORY)
+    assert problem_detected_data_visualization.PREV_DATA == {}
+
+# TESTING get_cached_problem_detected_data():
+def test_cached_problem_detected_data_matches_full_build():
+    df, problem_detected_df = get_cached_problem_detected_data(TEST_DATA_DIRECTORY)
+    expected_df = build_df_from_csv_files(path_to_csv_directory=TEST_DATA_DIRECTORY)
+    assert df.equals(expected_df)
+    assert problem_detected_df.equals(get_problem_detected_df(expected_df))
+
+    # Unchanged data directory returns the cached DataFrames
+    cached_df, cached_problem_detected_df = get_cached_problem_detected_data(TEST_DATA_DIRECTORY)
+    assert cached_df is df
+    assert cached_problem_detected_df is problem_detected_df
+
+def test_cached_problem_detected_data_reads_only_new_files(tmp_path, monkeypatch):
+    for file in ["NRG_N_TODAY_COMP_20211015.csv", "NRG_N_TODAY_COMP_20211016.csv"]:
+        shutil.copy(os.path.join(DATA_DIRECTORY, file), tmp_path)
+    get_cached_problem_detected_data(str(tmp_path))
+
+    read_files = []
+    def recording_read_csv_files(file_paths, **kwargs):
+        read_files.extend(os.path.basename(file_path) for file_path in file_paths)
+        return read_csv_files(file_paths, **kwargs)
+    monkeypatch.setattr("problem_detected_data_visualization.read_csv_files", recording_read_csv_files)
+
+    shutil.copy(os.path.join(DATA_DIRECTORY, "NRG_N_TODAY_COMP_20211017.csv"), tmp_path)
+    # Make sure the directory's modification time changes on coarse-grained filesystems
+    os.utime(tmp_path, ns=(0, 0))
+    df, _ = get_cached_problem_detected_data(str(tmp_path))
+
+    assert read_files == ["NRG_N_TODAY_COMP_20211017.csv"]
+    assert df.equals(build_df_from_csv_files(path_to_csv_directory=str(tmp_path)))
+
+def test_streamed_cached_problem_detected_data_reads_only_new_files(tmp_path, monkeypatch):
+    monkeypatch.setattr("problem_detected_data_visualization.STREAMING_CHUNK_ROWS", 7)
+    for file in ["NRG_N_TODAY_COMP_20211015.csv", "NRG_N_TODAY_COMP_20211016.csv"]:
+        shutil.copy(os.path.join(DATA_DIRECTORY, file), tmp_path)
+    get_cached_problem_detected_data(str(tmp_path))
+
+    read_files = []
+    def recording_read_reduced_csv_file(file_path, **kwargs):
+        read_files.append(os.path.basename(file_path))
+        return read_reduced_csv_file(file_path, **kwargs)
+    monkeypatch.setattr("problem_detected_data_visualization.read_reduced_csv_file", recording_read_reduced_csv_file)
+
+    shutil.copy(os.path.join(DATA_DIRECTORY, "NRG_N_TODAY_COMP_20211017.csv"), tmp_path)
+    os.utime(tmp_path, ns=(0, 0))
+    df, _ = get_cached_problem_detected_data(str(tmp_path))
+
+    assert read_files == ["NRG_N_TODAY_COMP_20211017.csv"]
+    assert df.equals(build_df_from_csv_files(path_to_csv_directory=str(tmp_path)))
+
+def test_cached_problem_detected_data_notices_files_rewritten_in_place(tmp_path):
+    csv_file = "NRG_N_TODAY_COMP_20240510.csv"
+    shutil.copy(os.path.join(DATA_DIRECTORY, csv_file), tmp_path)
+    _, problem_detected_df = get_cached_problem_detected_data(str(tmp_path))
+
+    # Rewriting a file keeps the directory's modification time
+    directory_stat = os.stat(tmp_path)
+    shutil.copy(os.path.join(TEST_DATA_DIRECTORY, csv_file), tmp_path)
+    os.utime(tmp_path / csv_file, ns=(0, directory_stat.st_mtime_ns + 10**9))
+    os.utime(tmp_path, ns=(directory_stat.st_atime_ns, directory_stat.st_mtime_ns))
+    _, rewritten_problem_detected_df = get_cached_problem_detected_data(str(tmp_path))
+
+    assert rewritten_problem_detected_df is not problem_detected_df
+    assert rewritten_problem_detected_df.equals(get_problem_detected_df(build_df_from_csv_files(path_to_csv_directory=str(tmp_path))))
+
+def test_other_date_ranges_do_not_evict_the_current_month(monkeypatch):
+    monkeypatch.setenv("RUNNING_WITH_DATE_STRING", "True")
+    monkeypatch.setenv("DATE_STRING", "2024-07-07")
+    current_month = get_current_month_date_range()
+    windows = OrderedDict([(current_month, "current month")])
+    for day in range(1, 3 * MAX_CACHED_WINDOWS):
+        window = (datetime(2024, 1, day).date(), datetime(2024, 2, day).date())
+        windows[window] = "other"
+        evict_least_recently_used_windows(windows)
+
+    assert len(windows) == MAX_CACHED_WINDOWS
+    assert windows[current_month] == "current month"
+    assert (datetime(2024, 1, 3 * MAX_CACHED_WINDOWS - 1).date(), datetime(2024, 2, 3 * MAX_CACHED_WINDOWS - 1).date()) in windows
+
+# TESTING get_problem_detected_statuses():
+def test_problem_detected_statuses_match_row_wise_formatting(monkeypatch):
+    csv_files = get_csv_files(DATA_DIRECTORY)[-DAYS_IN_MONTH:]
+    file_dfs = [read_csv_file(os.path.join(DATA_DIRECTORY, file)) for file in csv_files]
+    prev_data = {"NRG-BN001" : {"N: File Count" : TEST_FILE_COUNT, "N: Total File Size (MB)" : TEST_FILE_SIZE}}
+
+    # Format each file one row at a time, the way build_df_from_csv_files() used to
+    monkeypatch.setattr(problem_detected_data_visualization, "PREV_DATA", dict(prev_data))
+    expected_statuses = []
+    for file_df in file_dfs:
+        expected_statuses.extend(file_df.apply(format_problem_detected_column, axis=1))
+        file_df.apply(build_prev_data_dict, axis=1)
+    expected_prev_data = problem_detected_data_visualization.PREV_DATA
+
+    statuses, new_prev_data = get_problem_detected_statuses(pd.concat(file_dfs, ignore_index=True), prev_data=prev_data)
+    assert list(statuses) == expected_statuses
+    assert new_prev_data == expected_prev_data
+
+# TESTING the study state store:
+def test_study_state_store_replaces_replaying_older_dates(tmp_path, monkeypatch):
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    csv_files = ["NRG_N_TODAY_COMP_20211015.csv", "NRG_N_TODAY_COMP_20211016.csv"]
+    for file in csv_files:
+        shutil.copy(os.path.join(DATA_DIRECTORY, file), data_directory)
+    path_to_study_state = str(tmp_path / "study_state.sqlite3")
+
+    assert seed_study_state(str(data_directory), path_to_study_state) == csv_files
+    assert seed_study_state(str(data_directory), path_to_study_state) == []
+    replayed_df = build_df_from_file_dfs([read_csv_file(os.path.join(data_directory, file)) for file in csv_files], prev_data={})
+    replayed_df = replayed_df[replayed_df["Date"] == get_date_of_file(csv_files[1])]
+
+    # The newest date alone is classified as if the older date had been replayed
+    monkeypatch.setattr(problem_detected_data_visualization, "STUDY_STATE_STORE_ENABLED", True)
+    monkeypatch.setattr(problem_detected_data_visualization, "STUDY_STATE_PATH", path_to_study_state)
+    df, _ = get_cached_problem_detected_data(str(data_directory), start_date=get_date_of_file(csv_files[1]),
+                                             end_date=get_date_of_file(csv_files[1]))
+    assert df.equals(replayed_df)
+    assert not df.equals(build_df_from_file_dfs([read_csv_file(os.path.join(data_directory, csv_files[1]))], prev_data={}))
+
+def test_cached_problem_detected_data_notices_study_state_changes(tmp_path, monkeypatch):
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    csv_files = ["NRG_N_TODAY_COMP_20211015.csv", "NRG_N_TODAY_COMP_20211016.csv"]
+    for file in csv_files:
+        shutil.copy(os.path.join(DATA_DIRECTORY, file), data_directory)
+    monkeypatch.setattr(problem_detected_data_visualization, "STUDY_STATE_STORE_ENABLED", True)
+    monkeypatch.setattr(problem_detected_data_visualization, "STUDY_STATE_PATH", str(tmp_path / "study_state.sqlite3"))
+    newest_date = get_date_of_file(csv_files[1])
+
+    # Nothing is stored from before the newest date yet
+    df, _ = get_cached_problem_detected_data(str(data_directory), start_date=newest_date, end_date=newest_date)
+    assert df.equals(build_df_from_file_dfs([read_csv_file(os.path.join(data_directory, csv_files[1]))], prev_data={}))
+
+    # Storing the older date changes the file information the newest date is compared with
+    seed_study_state(str(data_directory), str(tmp_path / "study_state.sqlite3"))
+    df, _ = get_cached_problem_detected_data(str(data_directory), start_date=newest_date, end_date=newest_date)
+    replayed_df = build_df_from_file_dfs([read_csv_file(os.path.join(data_directory, file)) for file in csv_files], prev_data={})
+    assert df.equals(replayed_df[replayed_df["Date"] == newest_date])
+
+# TESTING ingest_csv_files_to_snapshots():
+def test_snapshots_match_csv_files(tmp_path):
+    ingested_files = ingest_csv_files_to_snapshots(TEST_DATA_DIRECTORY, str(tmp_path))
+    assert ingested_files == ["NRG_N_TODAY_COMP_20240510.csv"]
+    # Up-to-date snapshots aren't written again
+    assert ingest_csv_files_to_snapshots(TEST_DATA_DIRECTORY, str(tmp_path)) == []
+
+    file_path = os.path.join(TEST_DATA_DIRECTORY, "NRG_N_TODAY_COMP_20240510.csv")
+    snapshot_path = get_snapshot_path(file_path, str(tmp_path))
+    assert is_snapshot_current(file_path, snapshot_path)
+    assert read_snapshot_file(snapshot_path).equals(read_csv_file(file_path, path_to_snapshot_directory=None))
+
+def test_read_csv_files_mixes_snapshots_and_csv_files(tmp_path):
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    csv_files = get_csv_files(DATA_DIRECTORY)[-3:]
+    for file in csv_files[:2]:
+        shutil.copy(os.path.join(DATA_DIRECTORY, file), data_directory)
+    ingest_csv_files_to_snapshots(str(data_directory), str(tmp_path / "snapshots"))
+    # The newest file has no snapshot yet, so it falls back to its CSV file
+    shutil.copy(os.path.join(DATA_DIRECTORY, csv_files[2]), data_directory)
+
+    file_paths = [os.path.join(str(data_directory), file) for file in csv_files]
+    file_dfs = read_csv_files(file_paths, path_to_snapshot_directory=str(tmp_path / "snapshots"))
+    for file_path, file_df in zip(file_paths, file_dfs):
+        assert file_df.equals(read_csv_file(file_path, path_to_snapshot_directory=None))
+
+def test_directories_with_the_same_name_have_their_own_snapshots(tmp_path):
+    csv_file = "NRG_N_TODAY_COMP_20240510.csv"
+    for site in ["a", "b"]:
+        (tmp_path / site / "data").mkdir(parents=True)
+    shutil.copy(os.path.join(TEST_DATA_DIRECTORY, csv_file), tmp_path / "a" / "data")
+    shutil.copy(os.path.join(DATA_DIRECTORY, csv_file), tmp_path / "b" / "data")
+    snapshot_directory = str(tmp_path / "snapshots")
+
+    assert ingest_csv_files_to_snapshots(str(tmp_path / "a" / "data"), snapshot_directory) == [csv_file]
+    # b's CSV file isn't mistaken for a's snapshot
+    assert ingest_csv_files_to_snapshots(str(tmp_path / "b" / "data"), snapshot_directory) == [csv_file]
+    for site in ["a", "b"]:
+        file_path = str(tmp_path / site / "data" / csv_file)
+        assert read_csv_file(file_path, snapshot_directory).equals(read_csv_file(file_path, path_to_snapshot_directory=None))
+
+def test_ingest_skips_other_files_and_directories(tmp_path):
+    csv_file = "NRG_N_TODAY_COMP_20240510.csv"
+    shutil.copy(os.path.join(TEST_DATA_DIRECTORY, csv_file), tmp_path)
+    shutil.copy(os.path.join(DATA_DIRECTORY, "NRG_N_TODAY_COMP_20240509.csv"), tmp_path / "OTHER_FEED_20240509.csv")
+    (tmp_path / "README.txt").write_text("not a CSV file")
+    # Another data source nested in this one's directory
+    (tmp_path / "site_b").mkdir()
+    shutil.copy(os.path.join(DATA_DIRECTORY, csv_file), tmp_path / "site_b")
+    snapshot_directory = str(tmp_path / "snapshots")
+
+    assert ingest_csv_files_to_snapshots(str(tmp_path), snapshot_directory, prefix="NRG_N_TODAY_COMP_") == [csv_file]
+    assert ingest_csv_files_to_snapshots(str(tmp_path), snapshot_directory) == ["OTHER_FEED_20240509.csv"]
+
+# TESTING map_with_workers():
+def test_parallel_loading_matches_sequential_loading():
+    sequential_df = build_df_from_csv_files(path_to_csv_directory=DATA_DIRECTORY, num_workers=1)
+    assert build_df_from_csv_files(path_to_csv_directory=DATA_DIRECTORY, num_workers=4).equals(sequential_df)
+
+    csv_files = [os.path.join(DATA_DIRECTORY, file) for file in get_csv_files(DATA_DIRECTORY)[-3:]]
+    assert map_with_workers(get_date_of_file, csv_files, num_workers=2, executor_type="process") == \
+           [get_date_of_file(file) for file in csv_files]
+
+# TESTING get_csv_files_between_dates():
+def test_csv_files_between_dates_uses_calendar_dates(tmp_path):
+    for file in ["NRG_N_TODAY_COMP_20211015.csv", "NRG_N_TODAY_COMP_20211110.csv", "NRG_N_TODAY_COMP_20211201.csv"]:
+        shutil.copy(os.path.join(DATA_DIRECTORY, file), tmp_path)
+    (tmp_path / "README.txt").write_text("Not a data file")
+
+    # The default range covers DAYS_IN_MONTH calendar days ending on the newest date
+    assert get_csv_files_between_dates(str(tmp_path)) == ["NRG_N_TODAY_COMP_20211110.csv", "NRG_N_TODAY_COMP_20211201.csv"]
+    assert get_csv_files_between_dates(str(tmp_path), start_date=datetime(2021, 10, 1).date(), 
+                                       end_date=datetime(2021, 11, 10).date()) == ["NRG_N_TODAY_COMP_20211015.csv", 
+                                                                                   "NRG_N_TODAY_COMP_20211110.csv"]
+    
+    # New files are added to the index
+    shutil.copy(os.path.join(DATA_DIRECTORY, "NRG_N_TODAY_COMP_20211202.csv"), tmp_path)
+    os.utime(tmp_path, ns=(0, 0))
+    assert get_csv_files_between_dates(str(tmp_path))[-1] == "NRG_N_TODAY_COMP_20211202.csv"
+    assert get_file_index(str(tmp_path))["file_dates"]["README.txt"] is None
+
+def test_build_df_from_csv_files_between_dates():
+    start_date, end_date = datetime(2024, 1, 1).date(), datetime(2024, 3, 31).date()
+    df = build_df_from_csv_files(path_to_csv_directory=DATA_DIRECTORY, start_date=start_date, end_date=end_date)
+    assert df["Date"].min() == start_date
+    assert df["Date"].max() == end_date
+
+def test_streamed_df_matches_df_from_whole_files():
+    csv_files = [os.path.join(DATA_DIRECTORY, file) for file in get_csv_files_between_dates(
+                 DATA_DIRECTORY, start_date=datetime(2024, 3, 1).date(), end_date=datetime(2024, 3, 31).date())]
+    expected_prev_data = {}
+    expected_df = build_df_from_file_dfs(read_csv_files(csv_files, path_to_snapshot_directory=None), prev_data=expected_prev_data)
+
+    # Chunks smaller than a file still compare every row with the previous file's data
+    for chunk_rows in (1, 7, 1000):
+        prev_data = {}
+        df = build_df_from_csv_file_chunks(csv_files, chunk_rows=chunk_rows, prev_data=prev_data)
+        assert df.equals(expected_df)
+        assert df.index.equals(expected_df.index)
+        assert prev_data == expected_prev_data
+
+# TESTING get_multi_source_problem_detected_data():
+def use_data_sources(tmp_path, monkeypatch):
+    for file in ["NRG_N_TODAY_COMP_20211015.csv", "NRG_N_TODAY_COMP_20211016.csv"]:
+        shutil.copy(os.path.join(DATA_DIRECTORY, file), tmp_path)
+    # A second feed in the same directory whose files only differ in their prefix
+    shutil.copy(os.path.join(DATA_DIRECTORY, "NRG_N_TODAY_COMP_20211017.csv"), tmp_path / "OTHER_FEED_20211017.csv")
+    for name in ["DATA_SOURCES", "LAST_SOURCE_DATA", "SOURCE_LOADS", "MERGED_DATA_CACHE"]:
+        monkeypatch.setattr(problem_detected_data_visualization, name, OrderedDict())
+    monkeypatch.setattr(problem_detected_data_visualization, "SOURCE_LOADER", {"executor" : None})
+    register_data_source("nrg", str(tmp_path), prefix="NRG_N_TODAY_COMP_")
+    register_data_source("other", str(tmp_path), prefix="OTHER_FEED_")
+
+def test_data_sources_are_merged_with_their_names_on_study_ids(tmp_path, monkeypatch):
+    use_data_sources(tmp_path, monkeypatch)
+    start_date, end_date = datetime(2021, 10, 15).date(), datetime(2021, 10, 17).date()
+    _, merged_problem_detected_df = get_multi_source_problem_detected_data(start_date, end_date)
+
+    _, nrg_problem_detected_df = get_cached_problem_detected_data(str(tmp_path), start_date, end_date, prefix="NRG_N_TODAY_COMP_")
+    _, other_problem_detected_df = get_cached_problem_detected_data(str(tmp_path), start_date, end_date, prefix="OTHER_FEED_")
+    assert list(merged_problem_detected_df.columns) == [start_date, datetime(2021, 10, 16).date(), end_date]
+    assert merged_problem_detected_df.index.is_monotonic_increasing
+    assert merged_problem_detected_df.to_numpy().dtype == np.uint8
+
+    nrg_study_id = nrg_problem_detected_df.index[0]
+    assert list(merged_problem_detected_df.loc["nrg:" + nrg_study_id, :datetime(2021, 10, 16).date()]) == list(nrg_problem_detected_df.loc[nrg_study_id])
+    assert merged_problem_detected_df.loc["nrg:" + nrg_study_id, end_date] == 0
+    other_study_id = other_problem_detected_df.index[0]
+    assert merged_problem_detected_df.loc["other:" + other_study_id, end_date] == other_problem_detected_df.loc[other_study_id, end_date]
+
+def test_slow_data_source_does_not_hold_back_others(tmp_path, monkeypatch):
+    use_data_sources(tmp_path, monkeypatch)
+    start_date, end_date = datetime(2021, 10, 15).date(), datetime(2021, 10, 18).date()
+    get_multi_source_problem_detected_data(start_date, end_date)
+
+    release_other_source = threading.Event()
+    def slow_get_cached_problem_detected_data(path_to_csv_directory, *args, prefix="", **kwargs):
+        if prefix == "OTHER_FEED_":
+            release_other_source.wait()
+        return get_cached_problem_detected_data(path_to_csv_directory, *args, prefix=prefix, **kwargs)
+    monkeypatch.setattr(problem_detected_data_visualization, "get_cached_problem_detected_data", slow_get_cached_problem_detected_data)
+
+    shutil.copy(os.path.join(DATA_DIRECTORY, "NRG_N_TODAY_COMP_20211018.csv"), tmp_path)
+    os.utime(tmp_path, ns=(0, 0))
+    _, problem_detected_df = get_multi_source_problem_detected_data(start_date, end_date, timeout_seconds=0.1)
+    assert problem_detected_df.attrs["stale_sources"] == ["other"]
+    assert problem_detected_df.filter(like="nrg:", axis=0)[end_date].any()
+
+    other_source_load = problem_detected_data_visualization.SOURCE_LOADS[("other", (start_date, end_date))]
+    release_other_source.set()
+    other_source_load.result()
+    _, problem_detected_df = get_multi_source_problem_detected_data(start_date, end_date)
+    assert problem_detected_df.attrs["stale_sources"] == []
+
+def test_failed_data_source_is_left_out_of_merged_data(tmp_path, monkeypatch):
+    use_data_sources(tmp_path, monkeypatch)
+    register_data_source("missing", str(tmp_path / "missing"))
+    def failing_get_cached_problem_detected_data(path_to_csv_directory, *args, **kwargs):
+        if path_to_csv_directory.endswith("missing"):
+            raise FileNotFoundError(path_to_csv_directory)
+        return get_cached_problem_detected_data(path_to_csv_directory, *args, **kwargs)
+    monkeypatch.setattr(problem_detected_data_visualization, "get_cached_problem_detected_data", failing_get_cached_problem_detected_data)
+
+    start_date, end_date = datetime(2021, 10, 15).date(), datetime(2021, 10, 17).date()
+    _, problem_detected_df = get_multi_source_problem_detected_data(start_date, end_date)
+    assert problem_detected_df.attrs["failed_sources"] == ["missing"]
+    assert problem_detected_df.attrs["stale_sources"] == []
+    assert {study_id.partition(SOURCE_SEPARATOR)[0] for study_id in problem_detected_df.index} == {"nrg", "other"}
+
+def test_data_source_directories_may_contain_colons():
+    assert parse_data_source_location("data:NRG_N_TODAY_COMP_") == ("data", "NRG_N_TODAY_COMP_")
+    assert parse_data_source_location("data/site_b") == ("data/site_b", "")
+    assert parse_data_source_location("C:\\feeds\\site_b") == ("C:\\feeds\\site_b", "")
+    assert parse_data_source_location("C:\\feeds\\site_b:SITE_B_") == ("C:\\feeds\\site_b", "SITE_B_")
+    assert parse_data_source_location("/mnt/feed:b/data:NRG_") == ("/mnt/feed:b/data", "NRG_")
+    assert parse_data_source_location("/mnt/feed:b:") == ("/mnt/feed:b", "")
+
+# TESTING the encoded problem_detected_df:
+def test_encoded_problem_detected_df_matches_unstacked_statuses():
+    df = build_df_from_csv_files(path_to_csv_directory=DATA_DIRECTORY, start_date=datetime(2024, 1, 1).date(), end_date=datetime(2024, 3, 31).date())
+    problem_detected_df = get_problem_detected_df(df)
+    # How problem_detected_dfs were built before they were encoded
+    expected_problem_detected_df = df.groupby(["Study ID", "Date"])["Problem Detected"].last().unstack()
+
+    assert (problem_detected_df.dtypes == np.uint8).all()
+    assert pd.DataFrame(decode_statuses(problem_detected_df.to_numpy()), index=problem_detected_df.index, 
+                        columns=problem_detected_df.columns).equals(expected_problem_detected_df)
+
+def test_problem_detected_df_between_dates_is_a_view():
+    df = build_df_from_csv_files(path_to_csv_directory=DATA_DIRECTORY, start_date=datetime(2024, 1, 1).date(), end_date=datetime(2024, 3, 31).date())
+    problem_detected_df = get_problem_detected_df(df)
+    week_problem_detected_df = get_problem_detected_df_between_dates(problem_detected_df, current_date="2024-03-31", num_days_in_past=7)
+
+    assert list(week_problem_detected_df.columns) == [date for date in problem_detected_df.columns if date >= datetime(2024, 3, 25).date()]
+    assert np.shares_memory(week_problem_detected_df.to_numpy(), problem_detected_df.to_numpy())
+
+# TESTING get_html_for_problem_detected_df() caching:
+def test_html_cache_hits_for_same_data_version():
+    _, problem_detected_df = get_cached_problem_detected_data(TEST_DATA_DIRECTORY)
+    current_date = get_date_of_file("NRG_N_TODAY_COMP_20240510.csv")
+    stats = get_html_cache_stats()
+
+    html = get_html_for_problem_detected_df(problem_detected_df, num_days_in_past=7, current_date=current_date)
+    assert get_html_for_problem_detected_df(problem_detected_df, num_days_in_past=7, current_date=current_date) == html
+    assert get_html_cache_stats()["hits"] == stats["hits"] + 1
+
+    # DataFrames that weren't built by get_cached_problem_detected_data() aren't cached
+    get_html_for_problem_detected_df(test_problem_detected_df, num_days_in_past=7, current_date=current_date)
+    assert get_html_cache_stats()["misses"] == stats["misses"] + 1
+
+def test_html_cache_evicts_least_recently_used_html(monkeypatch):
+    monkeypatch.setattr(problem_detected_data_visualization, "HTML_CACHE_MAX_BYTES", 10)
+    monkeypatch.setattr(problem_detected_data_visualization, "HTML_CACHE", OrderedDict())
+    monkeypatch.setattr(problem_detected_data_visualization, "HTML_CACHE_STATS", {"hits" : 0, "misses" : 0, "evictions" : 0, "bytes" : 0})
+    cache_html(("version", "", 1, None), "a" * 6)
+    cache_html(("version", "", 7, None), "b" * 6)
+
+    assert get_cached_html(("version", "", 1, None)) is None
+    assert get_cached_html(("version", "", 7, None)) == "b" * 6
+    assert get_html_cache_stats()["evictions"] == 1
+    assert get_html_cache_stats()["bytes"] <= 10
+
+# TESTING render_problem_detected_table():
+def test_render_problem_detected_table():
+    dates = [datetime(2024, 5, day).date() for day in (7, 8, 10, 11, 12)]
+    problem_detected_df = pd.DataFrame([['E', 'G', "NR", None, 'G']], index=pd.Index(["A&B"], name="Study ID"), 
+                                       columns=pd.Index(dates, name="Date"))
+    table_html = render_problem_detected_table(problem_detected_df, link_study_ids=True)
+
+    # Dates surrounding a missing date match highlight_dates()
+    gap_dates = [style == "color: yellow;" for style in highlight_dates(pd.Series(dates))]
+    for date, gap in zip(dates, gap_dates):
+        assert (f'<th class="col_heading level0 gap-date">{date}</th>' in table_html) == gap
+
+    assert '<a href="/displaySingle/A%26B">A&amp;B</a>' in table_html
+    assert ['E', 'G', "NR", "NR", 'G'] == [cell.split('"')[0] for cell in table_html.split('<td class="data ')[1:]]
+    assert "<style" not in table_html
+
+# TESTING timing instrumentation:
+def test_timed_stages_are_recorded_for_the_current_request(monkeypatch):
+    monkeypatch.setattr(problem_detected_data_visualization, "TIMING_STATS", {})
+    start_request_timings()
+    get_problem_detected_df(test_df)
+    get_problem_detected_df(test_df)
+    request_timings = finish_request_timings()
+
+    assert list(request_timings) == ["pivot"]
+    assert problem_detected_data_visualization.TIMING_STATS["pivot"]["count"] == 2
+    assert finish_request_timings() == {}
+
+def test_metrics_text_uses_prometheus_format(monkeypatch):
+    monkeypatch.setattr(problem_detected_data_visualization, "TIMING_STATS", {"pivot" : {"count" : 2, "seconds" : 0.5}})
+    monkeypatch.setattr(problem_detected_data_visualization, "REQUEST_STATS", {"display_today" : {"count" : 1, "seconds" : 0.25}})
+    metrics_text = get_metrics_text()
+
+    assert 'problem_detected_stage_seconds_total{stage="pivot"} 0.5' in metrics_text
+    assert 'problem_detected_requests_total{endpoint="display_today"} 1' in metrics_text
+    assert "# TYPE problem_detected_html_cache_hits_total counter" in metrics_text
+
+# TESTING get_problem_detected_json():
+def test_problem_detected_json_filters_and_pages_studies():
+    start_date, end_date = datetime(2024, 6, 8).date(), datetime(2024, 7, 7).date()
+    _, problem_detected_df = get_cached_problem_detected_data(DATA_DIRECTORY, start_date=start_date, end_date=end_date)
+    status_json = get_problem_detected_json(problem_detected_df, start_date, end_date, statuses=['E'], page=2, page_size=5)
+
+    assert len(status_json["studies"]) == 5
+    assert status_json["total_studies"] == sum('E' in statuses for statuses in decode_statuses(problem_detected_df.to_numpy()).tolist())
+    for study_id, row in zip(status_json["studies"], status_json["rows"]):
+        statuses = [status_json["statuses"][int(code)] for code in row]
+        assert statuses == decode_statuses(problem_detected_df.loc[study_id].to_numpy()).tolist()
+        assert 'E' in statuses
+
+    status_json = get_problem_detected_json(problem_detected_df, start_date, end_date, study_ids=["EAY191-N4", "UNKNOWN"])
+    assert status_json["studies"] == ["EAY191-N4"]
+    assert len(status_json["rows"][0]) == len(status_json["dates"])
+
+# TESTING get_study_summaries():
+def test_study_summaries_count_errors_and_streaks():
+    start_date, end_date = datetime(2024, 6, 8).date(), datetime(2024, 7, 7).date()
+    df, problem_detected_df = get_cached_problem_detected_data(DATA_DIRECTORY, start_date=start_date, end_date=end_date)
+    study_summaries = get_study_summaries(df, problem_detected_df, end_date)
+    assert set(study_summaries) == set(problem_detected_df.index)
+
+    for study_id, study_summary in study_summaries.items():
+        statuses = decode_statuses(problem_detected_df.loc[study_id].to_numpy()).tolist()
+        error_dates = [date for date, status in zip(problem_detected_df.columns, statuses) if status == 'E']
+        streaks = "".join('E' if status == 'E' else '.' for status in statuses).split('.')
+        assert study_summary["errors_past_week"] == len([date for date in error_dates if (end_date - date).days < 7])
+        assert study_summary["errors_past_month"] == len(error_dates)
+        assert study_summary["current_error_streak"] == len(streaks[-1])
+        assert study_summary["longest_error_streak"] == max(len(streak) for streak in streaks)
+        assert study_summary["last_error_date"] == (str(error_dates[-1]) if error_dates else None)
+
+    study_metadata = get_study_metadata(df, end_date)
+    assert all(study_summaries[study_id]["occurrence"] == metadata["occurrence"] for study_id, metadata in study_metadata.items())